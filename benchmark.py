@@ -0,0 +1,377 @@
+# Benchmark harness for the public methods of Journalist, Company, Medialist and Media.
+#
+#   python -m media.benchmark [--latency MS] [--sizes 1,100,1000] [--concurrency 1,4,16]
+#   python -m media.benchmark --uri bolt://localhost:7687 --username neo4j --password secret
+#
+# By default the entity classes run against an in-memory stand-in for the neo4j driver, with
+# a configurable simulated latency and result size, so the numbers measure only client-side
+# overhead: query building, parameter preparation, date conversion and record hydration.
+# With --uri the same methods run against a local Neo4j instance loaded with the plan sweep
+# fixtures at each dataset size; write methods are skipped there unless --include-writes is set.
+# Every method runs at every combination of dataset size and thread count and the report
+# gives throughput and p50/p95/p99 latency.
+from media import connection
+from media.bulk import DEFAULT_BATCH_SIZE
+from media.company import Company
+from media.journalist import Journalist
+from media.media import Media
+from media.medialist import Medialist
+from media.search import Search
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from neo4j import Record
+from neo4j.time import Date
+import argparse
+import io
+import json
+import sys
+import time
+
+FAKE_URI = "bolt://benchmark.invalid:7687"
+FAKE_USERNAME = "benchmark"
+
+# Summary of a fake result, mirroring the timings of a neo4j ResultSummary
+class FakeSummary:
+    def __init__(self, latency):
+        self.result_available_after = int(latency * 1000)
+        self.result_consumed_after = 0
+        self.plan = None
+        self.profile = None
+
+class FakeResult:
+    def __init__(self, records, latency):
+        self._records = records
+        self._latency = latency
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def consume(self):
+        return FakeSummary(self._latency)
+
+# Answers every query with result_size prebuilt records after the simulated latency
+class FakeTransaction:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def run(self, query, parameters=None, **kwargs):
+        driver = self._driver
+        if driver.latency:
+            time.sleep(driver.latency)
+        return FakeResult(fake_records(driver.result_size), driver.latency)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakeSession(FakeTransaction):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def begin_transaction(self, **kwargs):
+        return FakeTransaction(self._driver)
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(FakeTransaction(self._driver), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(FakeTransaction(self._driver), *args, **kwargs)
+
+class FakeDriver:
+    def __init__(self, latency=0.0, result_size=1):
+        self.latency = latency
+        self.result_size = result_size
+
+    def session(self, **kwargs):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+# Register a fake driver under the benchmark address so entity classes built for it use it
+def install_fake_driver(latency=0.0, result_size=1):
+    driver = FakeDriver(latency, result_size)
+    with connection._drivers_lock:
+        connection._drivers[(FAKE_URI, FAKE_USERNAME)] = driver
+    return driver
+
+_fake_records = {}
+
+# size records carrying every column the entity queries return, as map projections with
+# neo4j temporal values so row hydration does the same work as against a server
+def fake_records(size):
+    records = _fake_records.get(size)
+    if records is None:
+        records = _fake_records[size] = [Record(_fake_values(i)) for i in range(size)]
+    return records
+
+def _fake_values(i):
+    journalist = {
+        "uid": f"journalist-{i}", "first_name": f"Writer{i}", "last_name": "Benchmark",
+        "birthdate": Date(1990, 1, 1), "description": "Benchmark journalist",
+        "email": f"writer{i}@example.com", "mobile_num": "0000", "industries": ["Technology"]
+    }
+    company = {
+        "uid": f"company-{i % 10}", "company_name": f"Company {i % 10}", "description": "Benchmark company",
+        "website_url": "https://example.com", "company_size_lower_bound": 10, "company_size_upper_bound": 50,
+        "headquarters": "SG", "email": "info@example.com", "founded_date": Date(2000, 1, 1), "industries": ["Technology"]
+    }
+    medialist = {
+        "uid": "medialist-0", "medialist_name": "Benchmark list", "creation_datetime": Date(2024, 1, 1),
+        "description": "Benchmark medialist", "member_count": 1, "industries": ["Technology"]
+    }
+    return {
+        "journalist": journalist, "person": journalist, "employee": journalist, "author": journalist,
+        "company": company, "medialist": medialist,
+        "media": {"first_name": "Benchmark", "last_name": f"Outlet{i}"},
+        "employment": {"role": "Reporter", "start_date": Date(2020, 1, 1), "end_date": None},
+        "included": {"creation_datetime": Date(2024, 1, 1)},
+        "note": {"creation_date": Date(2024, 1, 1), "content": "Benchmark note"},
+        "r": {"creation_date": Date(2024, 1, 1)},
+        "members": [], "matched": 0, "added": 0, "removed": 0, "created": 0, "updated": 0,
+        "has_label": True, "uid": journalist["uid"], "member_count": 1, "note_id": f"note-{i}", "index": i,
+        "employment_id": f"employment-{i}", "included_id": f"included-{i}",
+        "type": "Journalist", "node": journalist, "distance": 0, "score": 1.0, "industry": "Technology", "count": i
+    }
+
+# One benchmarked call: method name on an entity class and a function building its arguments
+# from the context. many marks list endpoints, which return a dataset-sized result.
+@dataclass(slots=True)
+class Case:
+    entity: type
+    method: str
+    arguments: object
+    many: bool = False
+    write: bool = False
+    variant: str = ""
+
+    @property
+    def name(self):
+        name = f"{self.entity.__name__}.{self.method}"
+        return f"{name}[{self.variant}]" if self.variant else name
+
+def _journalist_request(f):
+    return {"first_name": "Bench", "last_name": "Mark", "birthdate": "1990-01-01", "industries": ["Technology"]}
+
+def _company_request(f):
+    return {"company_name": "Bench Company", "founded_date": "2000-01-01", "industries": ["Technology"]}
+
+CASES = [
+    Case(Journalist, "find_journalists", lambda f: ({},), many=True),
+    Case(Journalist, "find_journalists", lambda f: ({"industry_list": ["Technology"]},), many=True, variant="industries"),
+    Case(Journalist, "find_journalists", lambda f: ({"name": "Writer1", "max_distance": 1},), many=True, variant="name"),
+    Case(Journalist, "find_journalists", lambda f: ({"rows": True, "fields": ["first_name", "last_name"]},), many=True, variant="rows"),
+    Case(Journalist, "add_journalist", lambda f: (_journalist_request(f),), write=True),
+    Case(Journalist, "add_journalists_bulk", lambda f: ([_journalist_request(f) for _ in range(100)],), write=True),
+    Case(Journalist, "find_journalist_by_uid", lambda f: ({"uid": f["journalist"]},)),
+    Case(Journalist, "update_journalist_industries", lambda f: ({"uid": f["journalist"], "new_industry_list": ["Technology"]},), write=True),
+    Case(Journalist, "add_journalist_industries", lambda f: (f["journalist"], ["Technology"]), write=True),
+    Case(Journalist, "remove_journalist_industries", lambda f: (f["journalist"], ["Politics"]), write=True),
+    Case(Journalist, "update_journalist_properties", lambda f: ({"uid": f["journalist"], "new_properties": {"birthdate": "1990-01-01"}},), write=True),
+    Case(Journalist, "add_employment_record", lambda f: ({
+        "uid": f["journalist"], "company_uid": f["company"],
+        "relationship_properties": {"role": "Editor", "start_date": "2024-01-01"}
+    },), write=True),
+    Case(Journalist, "get_all_employment_records", lambda f: ({"uid": f["journalist"]},), many=True),
+    Case(Journalist, "get_all_employment_records", lambda f: ({"uid": f["journalist"], "rows": True},), many=True, variant="rows"),
+    Case(Journalist, "get_all_employment_records", lambda f: ({"uid": f["journalist"], "current_only": True},), many=True, variant="current"),
+    Case(Journalist, "refresh_current_employers", lambda f: (f["journalist"],), write=True),
+    Case(Journalist, "refresh_current_employers", lambda f: (), write=True, variant="all"),
+    Case(Journalist, "get_all_notes", lambda f: ({"uid": f["journalist"]},), many=True),
+    Case(Journalist, "get_all_notes", lambda f: ({"uid": f["journalist"], "limit": 20, "author_summary": True},), many=True, variant="page"),
+    Case(Journalist, "create_new_note_for_journalist", lambda f: ({"uid": f["journalist"], "author_uid": f["author"], "content": "Bench"},), write=True),
+    Case(Journalist, "add_notes_bulk", lambda f: ([
+        {"uid": f["journalist"], "author_uid": f["author"], "content": "Bench"} for _ in range(100)
+    ], DEFAULT_BATCH_SIZE, None, "Journalist"), write=True),
+    Case(Journalist, "node_has_label", lambda f: ({"uid": f["journalist"], "label": "Journalist"},)),
+
+    Case(Company, "find_company_by_uid", lambda f: ({"uid": f["company"]},)),
+    Case(Company, "find_companies", lambda f: ({},), many=True),
+    Case(Company, "find_companies", lambda f: ({"name": "Company 1", "max_distance": 1},), many=True, variant="name"),
+    Case(Company, "add_company", lambda f: (_company_request(f),), write=True),
+    Case(Company, "add_companies_bulk", lambda f: ([_company_request(f) for _ in range(100)],), write=True),
+    Case(Company, "update_company_properties", lambda f: (f["company"], {"description": "Bench"}), write=True),
+    Case(Company, "update_company_industries", lambda f: ({"uid": f["company"], "new_industry_list": ["Technology"]},), write=True),
+    Case(Company, "add_company_industries", lambda f: (f["company"], ["Technology"]), write=True),
+    Case(Company, "remove_company_industries", lambda f: (f["company"], ["Politics"]), write=True),
+    Case(Company, "get_all_employment_records", lambda f: ({"uid": f["company"]},), many=True),
+    Case(Company, "get_all_employment_records", lambda f: ({"uid": f["company"], "rows": True},), many=True, variant="rows"),
+    Case(Company, "get_current_staff", lambda f: ({"uid": f["company"]},), many=True),
+    Case(Company, "get_current_staff", lambda f: ({"uid": f["company"], "rows": True},), many=True, variant="rows"),
+
+    Case(Medialist, "find_medialists", lambda f: ({},), many=True),
+    Case(Medialist, "find_medialists", lambda f: ({"name": "Fixture List 1", "max_distance": 1},), many=True, variant="name"),
+    Case(Medialist, "add_medialist", lambda f: ({"medialist_name": "Bench", "industries": ["Technology"]},), write=True),
+    Case(Medialist, "add_medialists_bulk", lambda f: ([{"medialist_name": "Bench"} for _ in range(100)],), write=True),
+    Case(Medialist, "find_medialist_by_uid", lambda f: ({"uid": f["medialist"]},)),
+    Case(Medialist, "update_medialist_industries", lambda f: ({"uid": f["medialist"], "new_industry_list": ["Technology"]},), write=True),
+    Case(Medialist, "add_medialist_industries", lambda f: (f["medialist"], ["Technology"]), write=True),
+    Case(Medialist, "remove_medialist_industries", lambda f: (f["medialist"], ["Politics"]), write=True),
+    Case(Medialist, "update_medialist_properties", lambda f: ({"uid": f["medialist"], "new_properties": {"description": "Bench"}},), write=True),
+    Case(Medialist, "add_to_medialist", lambda f: ({"uid": f["journalist"], "medialist_uid": f["medialist"], "relationship_properties": {}},), write=True),
+    Case(Medialist, "add_many_to_medialist", lambda f: ({"medialist_uid": f["medialist"], "uids": f["members"]},), write=True),
+    Case(Medialist, "remove_many_from_medialist", lambda f: ({"medialist_uid": f["medialist"], "uids": f["members"]},), write=True),
+    Case(Medialist, "get_all_in_medialist", lambda f: ({"uid": f["medialist"]},), many=True),
+    Case(Medialist, "get_all_in_medialist", lambda f: ({"uid": f["medialist"], "rows": True},), many=True, variant="rows"),
+    Case(Medialist, "get_medialist_detail", lambda f: ({"uid": f["medialist"], "include_employer": True},)),
+    Case(Medialist, "get_medialist_summary", lambda f: ({"uid": f["medialist"]},)),
+    Case(Medialist, "export_medialist", lambda f: ({"uid": f["medialist"], "include_employer": True}, io.StringIO(), "csv"), many=True),
+    Case(Medialist, "recount_medialist_members", lambda f: (f["medialist"],), write=True),
+
+    Case(Media, "find_all_media", lambda f: (), many=True),
+    Case(Media, "add_media", lambda f: ("Bench", "Mark", "1990-01-01", "Bench", None, None, ["Technology"]), write=True),
+    Case(Media, "fuzzy_search_media_by_name", lambda f: ("Fixture", 1), many=True),
+    Case(Media, "update_media_properties", lambda f: (f["media_id"], {"description": "Bench"}), write=True),
+    Case(Media, "add_media_industries", lambda f: (f["media_id"], ["Technology"]), write=True),
+    Case(Media, "remove_media_industries", lambda f: (f["media_id"], ["Politics"]), write=True),
+    Case(Media, "add_employment_record_for_media", lambda f: (f["media_id"], f["company_id"], {}), write=True),
+    Case(Media, "get_all_employment_records", lambda f: (f["media_id"],), many=True),
+    Case(Media, "get_all_notes", lambda f: (f["media_id"],), many=True),
+    Case(Media, "create_new_note_for_media", lambda f: (f["media_id"], {"content": "Bench"}), write=True),
+    Case(Media, "node_has_label", lambda f: (f["media_id"], "media")),
+
+    Case(Search, "search_all", lambda f: ({"name": "Fixture", "max_distance": 1, "top_k": 20, "per_type_limit": 10},), many=True),
+    Case(Search, "industry_facets", lambda f: ({},), many=True),
+    Case(Search, "industry_facets", lambda f: ({"name": "Fixture", "max_distance": 1},), many=True, variant="name"),
+]
+
+FAKE_CONTEXT = {
+    "journalist": "journalist-1",
+    "author": "journalist-0",
+    "company": "company-0",
+    "medialist": "medialist-0",
+    "members": [f"journalist-{i}" for i in range(0, 50, 5)],
+    "media_id": 1,
+    "company_id": 2
+}
+
+# Nearest-rank percentile of sorted values
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+# Call one case iterations times spread over concurrency threads, returning the statistics
+def run_case(instance, case, context, iterations, concurrency):
+    method = getattr(instance, case.method)
+
+    def call(_):
+        arguments = case.arguments(context)
+        start = time.perf_counter()
+        result = method(*arguments)
+        if hasattr(result, "__next__"):
+            for _ in result:
+                pass
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [call(i) for i in range(iterations)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(call, range(iterations)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "method": case.name,
+        "calls": iterations,
+        "throughput": iterations / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000
+    }
+
+def select_cases(pattern=None, include_writes=True):
+    return [
+        case for case in CASES
+        if (include_writes or not case.write) and (pattern is None or pattern in case.name)
+    ]
+
+# Benchmark against the in-memory driver; latency is in seconds
+def run_fake(sizes, concurrencies, iterations, latency=0.0, pattern=None):
+    driver = install_fake_driver(latency)
+    instances = {}
+    results = []
+    for size in sizes:
+        fake_records(size)  # Build the records up front so they are not timed
+        for case in select_cases(pattern):
+            instance = instances.get(case.entity)
+            if instance is None:
+                instance = instances[case.entity] = case.entity(FAKE_URI, FAKE_USERNAME, "")
+            driver.result_size = size if case.many else 1
+            for concurrency in concurrencies:
+                result = run_case(instance, case, FAKE_CONTEXT, iterations, concurrency)
+                result.update(size=size, concurrency=concurrency)
+                results.append(result)
+    return results
+
+# Benchmark against a Neo4j instance loaded with the plan sweep fixtures at each size
+def run_neo4j(uri, username, password, sizes, concurrencies, iterations, pattern=None, include_writes=False):
+    from media.plan_sweep import fixture_context, load_fixtures
+    from media.schema import ensure_schema
+
+    loader = connection.Neo4jConnection(uri, username, password)
+    ensure_schema(loader)
+    instances = {}
+    results = []
+    for size in sorted(sizes):
+        load_fixtures(loader, journalists=size)
+        context = fixture_context(loader)
+        for case in select_cases(pattern, include_writes):
+            instance = instances.get(case.entity)
+            if instance is None:
+                instance = instances[case.entity] = case.entity(uri, username, password)
+            for concurrency in concurrencies:
+                result = run_case(instance, case, context, iterations, concurrency)
+                result.update(size=size, concurrency=concurrency)
+                results.append(result)
+    return results
+
+def format_report(results):
+    lines = [f"{'method':<55} {'size':>6} {'threads':>7} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['method']:<55} {result['size']:>6} {result['concurrency']:>7} "
+            f"{result['throughput']:>10.1f} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f}"
+        )
+    return "\n".join(lines)
+
+def _integers(value):
+    return [int(part) for part in value.split(",") if part]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m media.benchmark")
+    parser.add_argument("--sizes", type=_integers, default=[1, 100, 1000], help="result sizes, or fixture sizes against Neo4j")
+    parser.add_argument("--concurrency", type=_integers, default=[1, 4, 16])
+    parser.add_argument("--iterations", type=int, default=200, help="calls per method, size and concurrency")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated query latency in milliseconds")
+    parser.add_argument("--methods", help="only run methods whose name contains this text")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--uri", help="benchmark against this Neo4j instance instead of the fake driver")
+    parser.add_argument("--username", default="neo4j")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--include-writes", action="store_true", help="also run write methods against Neo4j")
+    args = parser.parse_args(argv)
+
+    if args.uri:
+        results = run_neo4j(
+            args.uri, args.username, args.password, args.sizes, args.concurrency,
+            args.iterations, args.methods, args.include_writes
+        )
+    else:
+        results = run_fake(args.sizes, args.concurrency, args.iterations, args.latency / 1000, args.methods)
+
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+from media.connection import on_success
+from media.query_builder import canonical_labels, format_labels
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+import csv
+import gzip
+import io
+import json
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Separator for the industries column in CSV input
+CSV_LIST_SEPARATOR = ";"
+
+# Read bulk input rows as dicts from a list/iterable of dicts, a path, or an open
+# JSONL/CSV stream. The format is taken from the file extension unless fmt is given
+def read_records(source, fmt=None):
+    if isinstance(source, str):
+        fmt = fmt or ("csv" if source.lower().endswith(".csv") else "jsonl")
+        with open(source, newline="", encoding="utf-8") as stream:
+            yield from read_records(stream, fmt)
+        return
+
+    if not isinstance(source, io.IOBase) and fmt is None:
+        yield from source
+        return
+
+    if fmt == "csv":
+        for row in csv.DictReader(source):
+            row = {key: (value if value != "" else None) for key, value in row.items()}
+            if row.get("industries"):
+                row["industries"] = row["industries"].split(CSV_LIST_SEPARATOR)
+            yield row
+    else:
+        for line in source:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+# Coerce a numeric column of a bulk row. CSV cells are read as strings, while the JSON input
+# and the API store ints; empty cells (None) stay None
+def optional_int(value):
+    return int(value) if value is not None else None
+
+# Format a value for export: temporals as ISO strings and, in CSV, lists joined like the
+# industries column of the import
+def _export_value(value, fmt):
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if fmt == "csv" and isinstance(value, (list, tuple)):
+        return CSV_LIST_SEPARATOR.join(str(item) for item in value)
+    return value
+
+# Write dict rows to a path or an open stream as JSONL or CSV, chunk_size rows per write, so
+# memory stays flat however many rows the iterable yields. columns sets the CSV header and
+# defaults to the keys of the first row. Paths ending in .gz are gzipped; pass compress=True
+# to gzip into an open binary stream. Returns the number of rows written
+def write_records(rows, destination, fmt=None, columns=None, compress=None, chunk_size=DEFAULT_BATCH_SIZE):
+    with _export_stream(destination, fmt, compress) as (stream, fmt):
+        writer = RecordWriter(stream, fmt, columns)
+        for chunk in batched(rows, chunk_size):
+            writer.write(chunk)
+        writer.close()
+    return writer.written
+
+# Async counterpart of write_records for the async iterables of the async entity classes
+async def async_write_records(rows, destination, fmt=None, columns=None, compress=None, chunk_size=DEFAULT_BATCH_SIZE):
+    with _export_stream(destination, fmt, compress) as (stream, fmt):
+        writer = RecordWriter(stream, fmt, columns)
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                writer.write(chunk)
+                chunk = []
+        if chunk:
+            writer.write(chunk)
+        writer.close()
+    return writer.written
+
+# Open a path, or wrap an open stream, as a text stream for export, yielding (stream, fmt)
+@contextmanager
+def _export_stream(destination, fmt, compress):
+    if isinstance(destination, str):
+        gzipped = destination.lower().endswith(".gz")
+        name = destination[:-3] if gzipped else destination
+        fmt = fmt or ("csv" if name.lower().endswith(".csv") else "jsonl")
+        opener = gzip.open if (gzipped if compress is None else compress) else open
+        with opener(destination, "wt", newline="", encoding="utf-8") as stream:
+            yield stream, fmt
+        return
+
+    if compress:
+        with gzip.GzipFile(fileobj=destination, mode="wb") as compressed:
+            stream = io.TextIOWrapper(compressed, encoding="utf-8", newline="")
+            try:
+                yield stream, fmt
+            finally:
+                stream.flush()
+                stream.detach()
+        return
+
+    yield destination, fmt
+
+# Writes chunks of dict rows to a text stream as JSONL or CSV, counting them in written
+class RecordWriter:
+    def __init__(self, stream, fmt, columns=None):
+        self.stream = stream
+        self.fmt = fmt
+        self.columns = columns
+        self.written = 0
+        self._writer = None
+
+    def write(self, chunk):
+        chunk = [{key: _export_value(value, self.fmt) for key, value in row.items()} for row in chunk]
+        if self.fmt == "csv":
+            if self._writer is None:
+                self._writer = csv.DictWriter(self.stream, fieldnames=self.columns or list(chunk[0]), extrasaction="ignore")
+                self._writer.writeheader()
+            self._writer.writerows(chunk)
+        else:
+            self.stream.write("".join(json.dumps(row, default=str) + "\n" for row in chunk))
+        self.written += len(chunk)
+
+    # Write the header even when there were no rows
+    def close(self):
+        if self.fmt == "csv" and self._writer is None and self.columns:
+            csv.DictWriter(self.stream, fieldnames=self.columns).writeheader()
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# Write rows in UNWIND batches, one managed transaction per batch and industry label set.
+#
+# prepare_row turns a JSON request into (properties, industries) and may raise for invalid
+# rows; build_query returns the UNWIND statement for a tuple of industry labels; on_created
+# is called with the properties of every row that was written, inside a unit of work only
+# once it has committed. Returns
+# {"created": [uid, ...], "errors": [{"row": index, "error": message}, ...]} where index
+# is the position of the row in the input.
+def bulk_create(connection, source, prepare_row, build_query, batch_size=DEFAULT_BATCH_SIZE, fmt=None, on_created=None):
+    report = {"created": [], "errors": []}
+    rows = enumerate(read_records(source, fmt))
+
+    for batch in batched(rows, batch_size):
+        # Apply industry labels once per group rather than once per row
+        for labels, group in _label_groups(batch, prepare_row, report).items():
+            try:
+                connection.run_write_transaction(
+                    build_query(labels),
+                    {"rows": [properties for _, properties in group]}
+                )
+            except Exception as e:
+                _group_failed(report, group, e)
+                continue
+            _group_created(report, group, on_created)
+    return report
+
+# Async counterpart of bulk_create, for the async entity classes
+async def async_bulk_create(connection, source, prepare_row, build_query, batch_size=DEFAULT_BATCH_SIZE, fmt=None, on_created=None):
+    report = {"created": [], "errors": []}
+    rows = enumerate(read_records(source, fmt))
+
+    for batch in batched(rows, batch_size):
+        for labels, group in _label_groups(batch, prepare_row, report).items():
+            try:
+                await connection.run_write_transaction(
+                    build_query(labels),
+                    {"rows": [properties for _, properties in group]}
+                )
+            except Exception as e:
+                _group_failed(report, group, e)
+                continue
+            _group_created(report, group, on_created)
+    return report
+
+# Prepare every row of a batch, grouping the valid ones by their industry labels
+def _label_groups(batch, prepare_row, report):
+    groups = {}
+    for index, json_request in batch:
+        try:
+            properties, industries = prepare_row(json_request)
+            labels = canonical_labels(industries)
+        except Exception as e:
+            report["errors"].append({"row": index, "error": str(e)})
+            continue
+        groups.setdefault(labels, []).append((index, properties))
+    return groups
+
+def _group_failed(report, group, error):
+    for index, _ in group:
+        report["errors"].append({"row": index, "error": str(error)})
+
+def _group_created(report, group, on_created):
+    written = [properties for _, properties in group]
+    report["created"].extend(properties["uid"] for properties in written)
+    if on_created is None:
+        return
+
+    def notify():
+        for properties in written:
+            on_created(properties)
+    on_success(written, notify)
+
+# Write relationship rows in UNWIND batches, one managed transaction per batch.
+#
+# prepare_row turns a JSON request into the parameters of one row and may raise for invalid
+# rows. query unwinds $rows and returns the "index" of every row it wrote, so rows whose
+# endpoints were not found are reported as errors too. Returns
+# {"created": count, "errors": [{"row": index, "error": message}, ...]}.
+def bulk_create_relationships(connection, source, prepare_row, query, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+    report = {"created": 0, "errors": []}
+    rows = enumerate(read_records(source, fmt))
+
+    for batch in batched(rows, batch_size):
+        prepared = _prepared_rows(batch, prepare_row, report)
+        if not prepared:
+            continue
+        try:
+            records = connection.run_write_transaction(query, {"rows": prepared})
+        except Exception as e:
+            _rows_failed(report, prepared, e)
+            continue
+        _rows_written(report, prepared, records)
+    return report
+
+# Async counterpart of bulk_create_relationships, for the async entity classes
+async def async_bulk_create_relationships(connection, source, prepare_row, query, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+    report = {"created": 0, "errors": []}
+    rows = enumerate(read_records(source, fmt))
+
+    for batch in batched(rows, batch_size):
+        prepared = _prepared_rows(batch, prepare_row, report)
+        if not prepared:
+            continue
+        try:
+            records = await connection.run_write_transaction(query, {"rows": prepared})
+        except Exception as e:
+            _rows_failed(report, prepared, e)
+            continue
+        _rows_written(report, prepared, records)
+    return report
+
+# Prepare every row of a batch, tagging the valid ones with their index in the input
+def _prepared_rows(batch, prepare_row, report):
+    prepared = []
+    for index, json_request in batch:
+        try:
+            row = prepare_row(json_request)
+        except Exception as e:
+            report["errors"].append({"row": index, "error": str(e)})
+            continue
+        row["index"] = index
+        prepared.append(row)
+    return prepared
+
+def _rows_failed(report, prepared, error):
+    for row in prepared:
+        report["errors"].append({"row": row["index"], "error": str(error)})
+
+def _rows_written(report, prepared, records):
+    written = {record["index"] for record in records}
+    report["created"] += len(written)
+    for row in prepared:
+        if row["index"] not in written:
+            report["errors"].append({"row": row["index"], "error": "Node not found"})
+
+# Build "UNWIND $rows AS row CREATE (variable:Label) SET variable = row" with industry labels
+@lru_cache(maxsize=1024)
+def bulk_create_query(variable, label, labels):
+    query = (
+        "UNWIND $rows AS row "
+        f"CREATE ({variable}:{label}) "
+        f"SET {variable} = row "
+    )
+    if labels:
+        query += f"SET {variable}{format_labels(labels)} "
+    query += f"RETURN count({variable}) AS created"
+    return query
@@ -0,0 +1,189 @@
+from media.connection import after_commit, current_causal_context, in_unit_of_work
+from collections import OrderedDict
+import threading
+import time
+
+# LRU cache with a per-entry time to live, safe to share between threads.
+#
+# Every invalidation bumps the version of its key, or the epoch of the whole cache when it
+# matches keys by predicate. A reader takes the version before querying and passes it to set,
+# which drops the value if the key was invalidated meanwhile, so a result read before a write
+# committed is never stored after that write's invalidation.
+class LRUTTLCache:
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._epoch = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    # Return (True, value) on a hit and (False, None) on a miss or expired entry
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    # Version to pass to set for a value about to be read
+    def version(self, key):
+        with self._lock:
+            return self._epoch, self._versions.get(key, 0)
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            if version is not None and version != (self._epoch, self._versions.get(key, 0)):
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            # Bound the versions kept; a new epoch outdates every version handed out before
+            if len(self._versions) > self.maxsize:
+                self._versions.clear()
+                self._epoch += 1
+
+    # Drop every entry whose key satisfies predicate
+    def invalidate_matching(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+            self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+# Process-wide cache of by-uid lookups, keyed by (label, uid); None until enabled
+_node_cache = None
+
+def enable_node_cache(maxsize=10000, ttl=300.0):
+    global _node_cache
+    _node_cache = LRUTTLCache(maxsize, ttl)
+    return _node_cache
+
+def disable_node_cache():
+    global _node_cache
+    _node_cache = None
+
+def get_node_cache():
+    return _node_cache
+
+# Hit/miss/eviction counters of the node cache, or None when it is disabled
+def node_cache_stats():
+    return _node_cache.stats() if _node_cache is not None else None
+
+# Return (True, records, None) for a cached by-uid lookup, and (False, None, version) on a miss,
+# where version is passed on to cache_node. The cache is bypassed inside a causal context,
+# whose reads must see the client's own writes, and the version is then None
+def cached_node(label, uid):
+    if _node_cache is None or current_causal_context() is not None:
+        return False, None, None
+    hit, records = _node_cache.get((label, uid))
+    if hit:
+        return True, list(records), None
+    return False, None, _node_cache.version((label, uid))
+
+# Cache a lookup result read at version. Results read inside a unit of work may roll back, and
+# results read while the node was invalidated may predate a write, so both are skipped
+def cache_node(label, uid, records, version):
+    if _node_cache is not None and version is not None and records is not None and not in_unit_of_work():
+        _node_cache.set((label, uid), list(records), version)
+
+# Drop cached lookups after a write, and again once an open unit of work commits
+def invalidate_nodes(label, *uids):
+    cache = _node_cache
+    if cache is None:
+        return
+
+    def invalidate():
+        for uid in uids:
+            if uid is not None:
+                cache.invalidate((label, uid))
+
+    invalidate()
+    after_commit(invalidate)
+
+# Drop every cached lookup of a label, e.g. after a write that touched all of its nodes
+def invalidate_label(label):
+    cache = _node_cache
+    if cache is None:
+        return
+
+    def invalidate():
+        cache.invalidate_matching(lambda key: key[0] == label)
+
+    invalidate()
+    after_commit(invalidate)
+
+# Process-wide cache of industry facet counts, keyed by (types, name filter); None until enabled
+_facet_cache = None
+
+def enable_facet_cache(maxsize=1000, ttl=60.0):
+    global _facet_cache
+    _facet_cache = LRUTTLCache(maxsize, ttl)
+    return _facet_cache
+
+def disable_facet_cache():
+    global _facet_cache
+    _facet_cache = None
+
+def get_facet_cache():
+    return _facet_cache
+
+def facet_cache_stats():
+    return _facet_cache.stats() if _facet_cache is not None else None
+
+# Return (True, facets, None) for cached facet counts and (False, None, version) on a miss,
+# like cached_node
+def cached_facets(key):
+    if _facet_cache is None or current_causal_context() is not None:
+        return False, None, None
+    hit, facets = _facet_cache.get(key)
+    if hit:
+        return True, {search_type: dict(counts) for search_type, counts in facets.items()}, None
+    return False, None, _facet_cache.version(key)
+
+def cache_facets(key, facets, version):
+    if _facet_cache is not None and version is not None and facets is not None and not in_unit_of_work():
+        _facet_cache.set(key, {search_type: dict(counts) for search_type, counts in facets.items()}, version)
+
+# Drop cached facet counts that include a label after its nodes or industries changed, and
+# again once an open unit of work commits
+def invalidate_facets(label):
+    cache = _facet_cache
+    if cache is None:
+        return
+
+    def invalidate():
+        cache.invalidate_matching(lambda key: label in key[0])
+
+    invalidate()
+    after_commit(invalidate)
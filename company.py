@@ -1,178 +1,366 @@
-from media.connection import Neo4jConnection
-from datetime import datetime
+from media.cache import cache_node, cached_node, invalidate_facets, invalidate_nodes
+from media.bulk import DEFAULT_BATCH_SIZE, async_bulk_create, bulk_create, bulk_create_query, optional_int
+from media.connection import AsyncNeo4jConnection, Neo4jConnection, on_success
+from media.employment import current_employer_conditions, employment_match, employment_parameters
+from media.fuzzy import fuzzy_search_query
+from media.name_index import get_name_index, update_name_index
+from media.pagination import keyset_filter, keyset_order, keyset_parameters
+from media.query_builder import canonical_labels, format_labels, industry_filter, label_diff_query
+from media.rows import employment_rows, node_rows, relationship_return, return_item, EmploymentRow
+from datetime import datetime, date
 from neo4j.time import Date
 import uuid
 import pycountry
 
-class Company(Neo4jConnection):
-    def __init__(self, uri, username, password):
-        Neo4jConnection.__init__(self, uri, username, password)
+# Query builders shared by Company and AsyncCompany. Each returns (query, parameters)
 
-    # api/companies/{id} GET Fetch a company based on ID
-    def find_company_by_uid(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
+# Edit distances a name search compares, as (alias, property, name parameter)
+NAME_DISTANCES = [
+    ("fn_distance", "company_name", "name"),
+    ("reversed_fn_distance", "company_name", "reversed_name")
+]
+
+def find_company_by_uid_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
 
-        # Construct query string
-        query = (
-            "MATCH (company:Company) "
-            "WHERE company.uid = $uid "
-            "RETURN company"
+    # Construct query string
+    query = (
+        "MATCH (company:Company) "
+        "WHERE company.uid = $uid "
+        "RETURN company"
+    )
+    return query, {"uid": uid}
+
+def find_companies_query(json_request):
+    # Extract data from the JSON
+    name = json_request.get("name")
+    industry_list = json_request.get("industry_list")
+
+    # If a name is provided, conduct an index-backed fuzzy search
+    if name:
+        return fuzzy_search_query(
+            "company", "Company", "company_names", NAME_DISTANCES, json_request,
+            industry_list=industry_list
         )
-        return self.run_query(query, {"uid": uid})
 
-    # api/companies GET Fetch companies based on name and specified industries
-    def find_companies(self, json_request):
-        # Extract data from the JSON
-        name = json_request.get("name")
-        max_distance = json_request.get("max_distance")
-        industry_list = json_request.get("industry_list")
-
-        # Construct the query
-        query = (
-            "MATCH (company:Company"
+    # Construct the query
+    query = "MATCH (company:Company) "
+
+    # If the industries are specified, filter on them through a parameter
+    if industry_list:
+        query += industry_filter("company")
+
+    query += keyset_filter("company", json_request)
+    query += "RETURN " + return_item("company", "Company", json_request)
+    query += keyset_order("company", json_request)
+
+    parameters = keyset_parameters(json_request)
+    parameters["industry_list"] = list(canonical_labels(industry_list))
+    return query, parameters
+
+def add_company_query(json_request):
+    # Generate a unique ID
+    custom_id = str(uuid.uuid4())
+
+    # Format the founding date str
+    founded_date = datetime.strptime(json_request.get("founded_date"), "%Y-%m-%d").date()
+
+    # Extract attributes from the JSON object
+    parameters = {
+        "uid": custom_id,
+        "company_name": json_request.get("company_name"),
+        "description": json_request.get("description"),
+        "website_url": json_request.get("website_url"),
+        "company_size_lower_bound": json_request.get("company_size_lower_bound"),
+        "company_size_upper_bound": json_request.get("company_size_upper_bound"),
+        "headquarters": json_request.get("headquarters"),
+        "email": json_request.get("email"),
+        "founded_date": founded_date
+    }
+
+    # Format the industry labels in canonical order
+    industries = json_request.get("industries", [])
+    formatted_industries = format_labels(industries)
+
+    query = (
+        "CREATE (company:Company {"
+        "uid: $uid,"
+        "company_name: $company_name,"
+        "description: $description,"
+        "website_url: $website_url,"
+        "founded_date: date($founded_date),"
+        "company_size_lower_bound: $company_size_lower_bound,"
+        "company_size_upper_bound: $company_size_upper_bound,"
+        "email: $email,"
+        "headquarters: $headquarters"
+        "})"
+        + (f"SET company{formatted_industries} " if formatted_industries else " ")  # Add labels using SET clause
+        + "RETURN company"
+    )
+    return query, parameters
+
+# Prepare one company for bulk creation, returning (properties, industries)
+def company_row(json_request):
+    properties = {
+        "uid": str(uuid.uuid4()),
+        "company_name": json_request.get("company_name"),
+        "description": json_request.get("description"),
+        "website_url": json_request.get("website_url"),
+        "company_size_lower_bound": optional_int(json_request.get("company_size_lower_bound")),
+        "company_size_upper_bound": optional_int(json_request.get("company_size_upper_bound")),
+        "headquarters": json_request.get("headquarters"),
+        "email": json_request.get("email"),
+        "founded_date": date.fromisoformat(json_request.get("founded_date"))
+    }
+    return properties, json_request.get("industries", [])
+
+def update_company_properties_query(uid, new_properties):
+    # Format the birthdate property as a Neo4j date
+    if "founded_date" in new_properties:
+        new_properties["founded_date"] = Date.from_iso_format(new_properties["founded_date"])
+
+    # Construct query string
+    query = (
+        "MATCH (company:Company) "
+        "WHERE company.uid = $uid "
+        "SET company += $new_properties "
+        "RETURN company"
+    )
+    parameters = {"uid": uid, "new_properties": new_properties}
+    return query, parameters
+
+# Remove and add industry labels in a single statement, for one uid or a list of uids
+def update_company_industries_query(json_request):
+    return label_diff_query(
+        "company", "Company",
+        uid=json_request.get("uid"),
+        labels_to_remove=json_request.get("industries_to_remove"),
+        labels_to_add=json_request.get("new_industry_list"),
+        uids=json_request.get("uids")
+    )
+
+def add_company_industries_query(uid, new_industry_list):
+    return label_diff_query("company", "Company", uid=uid, labels_to_add=new_industry_list)
+
+def remove_company_industries_query(uid, industries_to_remove):
+    return label_diff_query("company", "Company", uid=uid, labels_to_remove=industries_to_remove)
+
+# Employment records at a company, optionally only the current ones or the ones overlapping
+# a period (see media.employment)
+def get_all_employment_records_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+
+    # Construct query string
+    query = (
+        employment_match("employee", "company:Company", "company", json_request)
+        + keyset_filter("employee", json_request, "employment")
+        + relationship_return(
+            json_request, "employment", EmploymentRow,
+            [("employee", "Journalist"), ("company", "Company")], parent="company"
         )
+        + keyset_order("employee", json_request, "employment")
+    )
 
-        # If the industries are specified, add them to the query in the form of labels
-        if industry_list:
-            labels = ":".join(industry_list)
-            query += f":{labels}"
+    parameters = {"uid": uid}
+    parameters.update(keyset_parameters(json_request))
+    parameters.update(employment_parameters(json_request))
+    return query, parameters
 
-        query += ") "
+# Journalists employed at a company on "as_of" (today by default), found through their
+# CURRENT_EMPLOYER links instead of the employment history
+def get_current_staff_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
 
-        # If a name is provided, conduct a fuzzy search
-        if name:
-            query += (
-                "WITH company, "
-                "     apoc.text.distance(toLower(company.company_name), toLower($name)) AS fn_distance, "
-                "     apoc.text.distance(toLower(company.company_name), toLower($reversed_name)) AS reversed_fn_distance "
-                "WHERE fn_distance <= $max_distance OR reversed_fn_distance <= $max_distance "
-            )
+    # Construct query string
+    query = (
+        "MATCH (employee:Journalist)-[current:CURRENT_EMPLOYER]->(company:Company) "
+        "WHERE " + " AND ".join(["company.uid = $uid"] + current_employer_conditions("current")) + " "
+        + keyset_filter("employee", json_request)
+        + "RETURN " + return_item("employee", "Journalist", json_request)
+        + keyset_order("employee", json_request)
+    )
+    parameters = {"uid": uid}
+    parameters.update(keyset_parameters(json_request))
+    parameters.update(employment_parameters(json_request))
+    return query, parameters
 
-        query += "RETURN company"
-        
-        parameters = {
-            "name": name,
-            "reversed_name": " ".join(reversed(name.split())) if name else "",
-            "max_distance": max_distance
-        }
+class Company(Neo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        Neo4jConnection.__init__(self, uri, username, password, **pool_config)
 
-        return self.run_query(query, parameters)
+    # api/companies/{id} GET Fetch a company based on ID
+    def find_company_by_uid(self, json_request):
+        # Serve from the read-through cache when it is enabled
+        uid = json_request.get("uid")
+        hit, records, version = cached_node("Company", uid)
+        if hit:
+            return records
+        records = self.run_read_query(*find_company_by_uid_query(json_request))
+        cache_node("Company", uid, records, version)
+        return records
+
+    # api/companies GET Fetch companies based on name and specified industries
+    def find_companies(self, json_request):
+        # Answer name searches from the in-memory index when it is enabled. It is only loaded
+        # outside a unit of work; until then the search runs in the database
+        index = get_name_index("Company") if json_request.get("name") else None
+        if index is not None and index.needs_load() and self._active_unit_of_work() is None:
+            index.load(self.run_read_query(*index.load_query()))
+        if index is not None and index.loaded:
+            query, parameters = index.search_query("company", json_request)
+        else:
+            query, parameters = find_companies_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "company", "Company") if json_request.get("rows") else records
 
     # api/companies POST Add a new company to the database
     def add_company(self, json_request):
-        # Generate a unique ID
-        custom_id = str(uuid.uuid4())
-
-        # Format the founding date str
-        founded_date = datetime.strptime(json_request.get("founded_date"), "%Y-%m-%d").date()
-
-        # Extract attributes from the JSON object
-        parameters = {
-            "uid": custom_id,
-            "company_name": json_request.get("company_name"),
-            "description": json_request.get("description"),
-            "website_url": json_request.get("website_url"),
-            "company_size_lower_bound": json_request.get("company_size_lower_bound"),
-            "company_size_upper_bound": json_request.get("company_size_upper_bound"),
-            "headquarters": json_request.get("headquarters"),
-            "email": json_request.get("email"),
-            "founded_date": founded_date
-        }
-
-        # Create a list of labels formatted as strings
-        industries = json_request.get("industries", [])
-        formatted_industries = [f":{industry}" for industry in industries]
-
-        query = (
-            "CREATE (company:Company {"
-            "uid: $uid,"
-            "company_name: $company_name,"
-            "description: $description,"
-            "website_url: $website_url,"
-            "founded_date: date($founded_date),"
-            "company_size_lower_bound: $company_size_lower_bound,"
-            "company_size_upper_bound: $company_size_upper_bound,"
-            "email: $email,"
-            "headquarters: $headquarters"
-            "})"
-            "SET company" + "".join(formatted_industries) + " "  # Add labels using SET clause
-            "RETURN company"
-        )
+        query, parameters = add_company_query(json_request)
         result = self.run_query(query, parameters)
+        on_success(result, lambda: update_name_index("Company", parameters["uid"], parameters))
+        invalidate_facets("Company")
         return result
 
+    # Bulk import companies from an iterable of JSON requests or a JSONL/CSV stream
+    def add_companies_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+        report = bulk_create(
+            self, source, company_row,
+            lambda labels: bulk_create_query("company", "Company", labels),
+            batch_size, fmt,
+            on_created=lambda properties: update_name_index("Company", properties["uid"], properties)
+        )
+        if report["created"]:
+            invalidate_facets("Company")
+        return report
+
     # api/companies/{id}/details PUT Update a company's details
     def update_company_properties(self, uid, new_properties):
-        # Format the birthdate property as a Neo4j date
-        if "founded_date" in new_properties:
-            new_properties["founded_date"] = Date.from_iso_format(new_properties["founded_date"])
-
-        # Construct query string
-        query = (
-            "MATCH (company:Company) "
-            "WHERE company.uid = $uid "
-            "SET company += $new_properties "
-            "RETURN company"
-        )
-        parameters = {"uid": uid, "new_properties": new_properties}
-        return self.run_query(query, parameters)
+        query, parameters = update_company_properties_query(uid, new_properties)
+        result = self.run_query(query, parameters)
+        invalidate_nodes("Company", uid)
+        on_success(result, lambda: update_name_index("Company", parameters["uid"], parameters["new_properties"]))
+        invalidate_facets("Company")
+        return result
 
     #api/companies/{id}/industries PUT Update a company’s industries (labels)
     def update_company_industries(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
-        new_industry_list = json_request.get("new_industry_list")
-        industries_to_remove = json_request.get("industries_to_remove")
-
-        # Remove specified industries
-        self.remove_company_industries(uid, industries_to_remove)
-
-        # Add specified industries
-        return self.add_company_industries(uid, new_industry_list)
-
+        result = self.run_query(*update_company_industries_query(json_request))
+        invalidate_nodes("Company", json_request.get("uid"), *(json_request.get("uids") or []))
+        invalidate_facets("Company")
+        return result
 
     def add_company_industries(self, uid, new_industry_list):
-        # Construct query string
-        query = (
-            "MATCH (company:Company) "
-            "WHERE company.uid = $uid "
-            "SET company:"
-            + ":".join(new_industry_list)
-            + " "
-            "RETURN company"
-        )
-        parameters = {"uid": uid}
-        return self.run_query(query, parameters)
+        result = self.run_query(*add_company_industries_query(uid, new_industry_list))
+        invalidate_nodes("Company", uid)
+        invalidate_facets("Company")
+        return result
 
     def remove_company_industries(self, uid, industries_to_remove):
-        # Format the list of labels to remove
-        industries_to_remove_str = ":".join(industries_to_remove)
-
-        # Construct query string
-        query = (
-            "MATCH (company:Company) "
-            "WHERE company.uid = $uid "
-            "REMOVE company:"
-            + industries_to_remove_str
-            + " "
-            "RETURN company"
-        )
-        parameters = {"uid": uid}
-        return self.run_query(query, parameters)
+        result = self.run_query(*remove_company_industries_query(uid, industries_to_remove))
+        invalidate_nodes("Company", uid)
+        invalidate_facets("Company")
+        return result
 
     # api/companies/{id}/employees GET Get all current and old employees from a company
     def get_all_employment_records(self, json_request):
-        # Extract fields from JSON
+        query, parameters = get_all_employment_records_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return employment_rows(records, "employee", "company") if json_request.get("rows") else records
+
+    # api/companies/{id}/staff GET Get the current employees of a company
+    def get_current_staff(self, json_request):
+        query, parameters = get_current_staff_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "employee", "Journalist") if json_request.get("rows") else records
+
+class AsyncCompany(AsyncNeo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        AsyncNeo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/companies/{id} GET Fetch a company based on ID
+    async def find_company_by_uid(self, json_request):
+        # Serve from the read-through cache when it is enabled
         uid = json_request.get("uid")
+        hit, records, version = cached_node("Company", uid)
+        if hit:
+            return records
+        records = await self.run_read_query(*find_company_by_uid_query(json_request))
+        cache_node("Company", uid, records, version)
+        return records
+
+    # api/companies GET Fetch companies based on name and specified industries
+    async def find_companies(self, json_request):
+        # Answer name searches from the in-memory index when it is enabled. It is only loaded
+        # outside a unit of work; until then the search runs in the database
+        index = get_name_index("Company") if json_request.get("name") else None
+        if index is not None and index.needs_load() and self._active_unit_of_work() is None:
+            index.load(await self.run_read_query(*index.load_query()))
+        if index is not None and index.loaded:
+            query, parameters = index.search_query("company", json_request)
+        else:
+            query, parameters = find_companies_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "company", "Company") if json_request.get("rows") else records
 
-        # Construct query string
-        query = (
-            "MATCH (employee)-[employment:EMPLOYMENT]->(company) "
-            "WHERE company.uid = $uid "
-            "RETURN employment, employee, company"
+    # api/companies POST Add a new company to the database
+    async def add_company(self, json_request):
+        query, parameters = add_company_query(json_request)
+        result = await self.run_query(query, parameters)
+        on_success(result, lambda: update_name_index("Company", parameters["uid"], parameters))
+        invalidate_facets("Company")
+        return result
+
+    # Bulk import companies from an iterable of JSON requests or a JSONL/CSV stream
+    async def add_companies_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+        report = await async_bulk_create(
+            self, source, company_row,
+            lambda labels: bulk_create_query("company", "Company", labels),
+            batch_size, fmt,
+            on_created=lambda properties: update_name_index("Company", properties["uid"], properties)
         )
+        if report["created"]:
+            invalidate_facets("Company")
+        return report
 
-        parameters = {"uid": uid}
-        result = self.run_query(query, parameters)
-        return result
\ No newline at end of file
+    # api/companies/{id}/details PUT Update a company's details
+    async def update_company_properties(self, uid, new_properties):
+        query, parameters = update_company_properties_query(uid, new_properties)
+        result = await self.run_query(query, parameters)
+        invalidate_nodes("Company", uid)
+        on_success(result, lambda: update_name_index("Company", parameters["uid"], parameters["new_properties"]))
+        invalidate_facets("Company")
+        return result
+
+    #api/companies/{id}/industries PUT Update a company’s industries (labels)
+    async def update_company_industries(self, json_request):
+        result = await self.run_query(*update_company_industries_query(json_request))
+        invalidate_nodes("Company", json_request.get("uid"), *(json_request.get("uids") or []))
+        invalidate_facets("Company")
+        return result
+
+    async def add_company_industries(self, uid, new_industry_list):
+        result = await self.run_query(*add_company_industries_query(uid, new_industry_list))
+        invalidate_nodes("Company", uid)
+        invalidate_facets("Company")
+        return result
+
+    async def remove_company_industries(self, uid, industries_to_remove):
+        result = await self.run_query(*remove_company_industries_query(uid, industries_to_remove))
+        invalidate_nodes("Company", uid)
+        invalidate_facets("Company")
+        return result
+
+    # api/companies/{id}/employees GET Get all current and old employees from a company
+    async def get_all_employment_records(self, json_request):
+        query, parameters = get_all_employment_records_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return employment_rows(records, "employee", "company") if json_request.get("rows") else records
+
+    # api/companies/{id}/staff GET Get the current employees of a company
+    async def get_current_staff(self, json_request):
+        query, parameters = get_current_staff_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "employee", "Journalist") if json_request.get("rows") else records
\ No newline at end of file
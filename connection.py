@@ -1,21 +1,548 @@
-from neo4j import GraphDatabase
+from media.metrics import calling_method, get_metrics, start_observation
+from media.plans import capture_plans, current_capture
+from neo4j import READ_ACCESS, WRITE_ACCESS, AsyncGraphDatabase, Bookmarks, GraphDatabase
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import base64
+import binascii
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Default connection pool settings shared by every entity class. Managed transactions that
+# fail with a transient error (leader switch, deadlock, lost connection) are retried after
+# initial_retry_delay seconds, growing by retry_delay_multiplier with +/- jitter between
+# attempts, until max_transaction_retry_time seconds have passed since the first failure.
+# Use a neo4j:// URI so reads are routed across the followers of a cluster
+DEFAULT_POOL_CONFIG = {
+    "max_connection_pool_size": 100,
+    "connection_acquisition_timeout": 60.0,
+    "max_connection_lifetime": 3600,
+    "max_transaction_retry_time": 30.0,
+    "initial_retry_delay": 1.0,
+    "retry_delay_multiplier": 2.0,
+    "retry_delay_jitter_factor": 0.2,
+}
+
+# Process-wide driver registries, keyed by (uri, username)
+_drivers = {}
+_async_drivers = {}
+_drivers_lock = threading.Lock()
+
+# Return the shared driver for a database, creating it on first use
+def get_driver(uri, username, password, **pool_config):
+    key = (uri, username)
+    driver = _drivers.get(key)
+    if driver is not None:
+        return driver
+
+    with _drivers_lock:
+        driver = _drivers.get(key)
+        if driver is None:
+            config = dict(DEFAULT_POOL_CONFIG)
+            config.update(pool_config)
+            driver = GraphDatabase.driver(uri, auth=(username, password), **config)
+            _drivers[key] = driver
+    return driver
+
+# Close the shared driver for a database and remove it from the registry
+def close_driver(uri, username):
+    with _drivers_lock:
+        driver = _drivers.pop((uri, username), None)
+    if driver is not None:
+        driver.close()
+
+# Close every shared sync driver, e.g. on application shutdown
+def close_all_drivers():
+    with _drivers_lock:
+        drivers = list(_drivers.values())
+        _drivers.clear()
+    for driver in drivers:
+        driver.close()
+
+# Return the shared async driver for a database, creating it on first use
+def get_async_driver(uri, username, password, **pool_config):
+    key = (uri, username)
+    driver = _async_drivers.get(key)
+    if driver is not None:
+        return driver
+
+    with _drivers_lock:
+        driver = _async_drivers.get(key)
+        if driver is None:
+            config = dict(DEFAULT_POOL_CONFIG)
+            config.update(pool_config)
+            driver = AsyncGraphDatabase.driver(uri, auth=(username, password), **config)
+            _async_drivers[key] = driver
+    return driver
+
+# Close the shared async driver for a database and remove it from the registry
+async def close_async_driver(uri, username):
+    with _drivers_lock:
+        driver = _async_drivers.pop((uri, username), None)
+    if driver is not None:
+        await driver.close()
+
+# Close every shared async driver, e.g. on application shutdown
+async def close_all_async_drivers():
+    with _drivers_lock:
+        drivers = list(_async_drivers.values())
+        _async_drivers.clear()
+    for driver in drivers:
+        await driver.close()
+
+# Run a query on a session or transaction and list its records, timing it when metrics are enabled
+def _fetch(runner, query, parameters=None, method=None):
+    capture = current_capture()
+    if capture is not None:
+        return capture.run(runner, query, parameters, method)
+    observation = start_observation(query, method)
+    if observation is None:
+        return list(runner.run(query, parameters))
+    try:
+        result = runner.run(query, parameters)
+        observation.started()
+        records = list(result)
+        observation.finish(result.consume(), len(records))
+    except Exception as e:
+        observation.fail(e)
+        raise
+    return records
+
+async def _async_fetch(runner, query, parameters=None, method=None):
+    capture = current_capture()
+    if capture is not None:
+        return await capture.run_async(runner, query, parameters, method)
+    observation = start_observation(query, method)
+    if observation is None:
+        result = await runner.run(query, parameters)
+        return [record async for record in result]
+    try:
+        result = await runner.run(query, parameters)
+        observation.started()
+        records = [record async for record in result]
+        observation.finish(await result.consume(), len(records))
+    except Exception as e:
+        observation.fail(e)
+        raise
+    return records
+
+# Run a query in a managed transaction with the given access mode, which the driver routes
+# to a follower for reads and to the leader for writes and retries on transient errors. When
+# metrics are enabled the observation spans the whole managed call, so it times the pool
+# acquisition and counts the retries and the failures that happen before the query runs
+def _execute(session, access_mode, query, parameters=None, method=None):
+    execute = session.execute_read if access_mode == READ_ACCESS else session.execute_write
+    observation = start_observation(query, method) if current_capture() is None else None
+    if observation is None:
+        return execute(lambda tx: _fetch(tx, query, parameters, method))
+
+    def work(tx):
+        observation.attempt()
+        result = tx.run(query, parameters)
+        observation.started()
+        records = list(result)
+        return records, result.consume()
+
+    try:
+        records, summary = execute(work)
+    except Exception as e:
+        observation.fail(e)
+        raise
+    observation.finish(summary, len(records))
+    return records
+
+async def _async_execute(session, access_mode, query, parameters=None, method=None):
+    execute = session.execute_read if access_mode == READ_ACCESS else session.execute_write
+    observation = start_observation(query, method) if current_capture() is None else None
+    if observation is None:
+        async def work(tx):
+            return await _async_fetch(tx, query, parameters, method)
+        return await execute(work)
+
+    async def observed_work(tx):
+        observation.attempt()
+        result = await tx.run(query, parameters)
+        observation.started()
+        records = [record async for record in result]
+        return records, await result.consume()
+
+    try:
+        records, summary = await execute(observed_work)
+    except Exception as e:
+        observation.fail(e)
+        raise
+    observation.finish(summary, len(records))
+    return records
+
+# Name of the calling entity method, resolved only when metrics are enabled
+def _method_for_metrics():
+    return calling_method() if get_metrics() is not None else None
+
+# Unit of work open in the current thread or task, if any
+_current_unit_of_work = ContextVar("current_unit_of_work", default=None)
+
+# One explicit transaction shared by every entity class that uses the same driver. Each
+# statement runs as soon as it is issued, so entity methods see their own results and the
+# earlier writes of the block, and the server makes it durable with a single commit
+class UnitOfWork:
+    def __init__(self, driver, transaction):
+        self.driver = driver
+        self.transaction = transaction
+        self._after_commit = []
+
+    # Register a callback to run once the transaction has committed
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def run(self, query, parameters=None):
+        return _fetch(self.transaction, query, parameters)
+
+class AsyncUnitOfWork(UnitOfWork):
+    async def run(self, query, parameters=None):
+        return await _async_fetch(self.transaction, query, parameters)
+
+def in_unit_of_work():
+    return _current_unit_of_work.get() is not None
+
+# Run callback once the open unit of work commits; does nothing outside a unit of work
+def after_commit(callback):
+    unit_of_work = _current_unit_of_work.get()
+    if unit_of_work is not None:
+        unit_of_work.after_commit(callback)
+
+# Run callback after a write succeeded; inside a unit of work, only once it has committed
+def on_success(result, callback):
+    if in_unit_of_work():
+        after_commit(lambda: callback() if result else None)
+    elif result:
+        callback()
+
+# Bookmarks of one logical client, e.g. a user across HTTP requests. Every session opened
+# inside causal_context waits until the server has applied the writes these bookmarks point
+# to before it runs, so a read on a follower sees the client's own earlier writes, and adds
+# the bookmark of its own work once it finishes.
+class CausalContext:
+    def __init__(self, bookmarks=None):
+        self._bookmarks = bookmarks if bookmarks is not None else Bookmarks()
+        self._lock = threading.Lock()
+
+    @property
+    def bookmarks(self):
+        return self._bookmarks
+
+    # Take the bookmarks a session ended with. They supersede the ones it started from, but are
+    # merged if another session of the same client finished in the meantime
+    def update(self, started, bookmarks):
+        with self._lock:
+            if self._bookmarks is started:
+                self._bookmarks = bookmarks
+            else:
+                self._bookmarks = self._bookmarks + bookmarks
+
+    # Opaque string to hand to the client, e.g. in a response header, and pass back to
+    # causal_context on its next request
+    def token(self):
+        values = json.dumps(sorted(self._bookmarks.raw_values)).encode()
+        return base64.urlsafe_b64encode(values).decode()
+
+    @classmethod
+    def from_token(cls, token):
+        if not token:
+            return cls()
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise ValueError("Invalid bookmark token")
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError("Invalid bookmark token")
+        return cls(Bookmarks.from_raw_values(values))
+
+# Causal context open in the current thread or task, if any
+_current_causal_context = ContextVar("current_causal_context", default=None)
+
+def current_causal_context():
+    return _current_causal_context.get()
+
+# Give every query run inside the block, by any entity class, read-your-writes consistency
+# from the bookmark token of an earlier request. A nested context without a token continues
+# from the enclosing one and passes its bookmarks back out when it closes
+@contextmanager
+def causal_context(token=None):
+    outer = _current_causal_context.get()
+    if token is None and outer is not None:
+        context = CausalContext(outer.bookmarks)
+    else:
+        context = CausalContext.from_token(token)
+    started = context.bookmarks
+    reset = _current_causal_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_causal_context.reset(reset)
+        if outer is not None and context.bookmarks is not started:
+            outer.update(started, context.bookmarks)
 
 class Neo4jConnection:
-    def __init__(self, uri, username, password):
-        self._driver = GraphDatabase.driver(uri, auth=(username, password))
+    def __init__(self, uri, username, password, **pool_config):
+        self._uri = uri
+        self._username = username
+        self._driver = get_driver(uri, username, password, **pool_config)
 
+    # Explicitly shut down the shared driver, closing it for every entity class using it
     def close(self):
-        self._driver.close()
+        close_driver(self._uri, self._username)
+
+    # Group every query run inside the block, by any entity class sharing this driver, into
+    # one transaction that commits once at the end and rolls back if the block raises
+    @contextmanager
+    def unit_of_work(self):
+        with self._session() as session:
+            transaction = session.begin_transaction()
+            unit_of_work = UnitOfWork(self._driver, transaction)
+            token = _current_unit_of_work.set(unit_of_work)
+            try:
+                yield unit_of_work
+                transaction.commit()
+            except BaseException:
+                transaction.rollback()
+                raise
+            finally:
+                _current_unit_of_work.reset(token)
+                transaction.close()
+            unit_of_work.run_after_commit()
+
+    # Run every query issued inside the block under EXPLAIN or PROFILE and collect the plans
+    # in the yielded PlanCapture; combine with a rolled-back unit of work to profile writes
+    def capture_plans(self, mode="PROFILE"):
+        return capture_plans(mode)
+
+    # Read your own writes inside the block, starting from the bookmark token of an earlier
+    # request; hand context.token() back to the client afterwards
+    def causal_context(self, token=None):
+        return causal_context(token)
+
+    # Return the open unit of work if it belongs to this connection's driver
+    def _active_unit_of_work(self):
+        unit_of_work = _current_unit_of_work.get()
+        if unit_of_work is not None and unit_of_work.driver is self._driver:
+            return unit_of_work
+        return None
+
+    # Borrow a pooled session, chained to the bookmarks of the open causal context if any
+    @contextmanager
+    def _session(self, **config):
+        context = _current_causal_context.get()
+        if context is None:
+            with self._driver.session(**config) as session:
+                yield session
+            return
+
+        started = context.bookmarks
+        with self._driver.session(bookmarks=started, **config) as session:
+            yield session
+            context.update(started, session.last_bookmarks())
+
+    # Run a query in a managed write transaction on the leader. Transient errors are retried;
+    # errors that persist are logged and None is returned
+    def run_query(self, query, parameters=None, access_mode=WRITE_ACCESS):
+        # Inside a unit of work, errors propagate so the whole transaction rolls back
+        unit_of_work = self._active_unit_of_work()
+        if unit_of_work is not None:
+            return unit_of_work.run(query, parameters)
 
-    def run_query(self, query, parameters=None):
+        records = None
         try:
-            with self._driver.session() as session:
+            # Borrow a pooled connection for the duration of the query
+            with self._session() as session:
+                records = _execute(session, access_mode, query, parameters)  # Fetch all records and store them in a list
+
+        except Exception as e:
+            logger.error("Query failed: %s", e)
+        return records
+
+    # Run a query that only reads in a managed read transaction, which may go to any follower
+    def run_read_query(self, query, parameters=None):
+        return self.run_query(query, parameters, READ_ACCESS)
+
+    # Yield records as they arrive from the server, fetch_size at a time, instead of
+    # materialising the whole result. Streams are read-only and routed to followers, but not
+    # retried once records were yielded
+    def stream_query(self, query, parameters=None, fetch_size=None):
+        return self._stream_records(query, parameters, _method_for_metrics(), fetch_size)
+
+    def _stream_records(self, query, parameters, method, fetch_size=None):
+        unit_of_work = self._active_unit_of_work()
+        if unit_of_work is not None:
+            yield from unit_of_work.run(query, parameters)
+            return
+
+        config = {"fetch_size": fetch_size} if fetch_size else {}
+        with self._session(default_access_mode=READ_ACCESS, **config) as session:
+            if current_capture() is not None:
+                yield from _fetch(session, query, parameters, method)
+                return
+            observation = start_observation(query, method)
+            try:
                 result = session.run(query, parameters=parameters)
-                records = list(result)  # Fetch all records and store them in a list
+                if observation is not None:
+                    observation.started()
+                count = 0
+                for record in result:
+                    count += 1
+                    yield record
+                if observation is not None:
+                    observation.finish(result.consume(), count)
+            except Exception as e:
+                if observation is not None:
+                    observation.fail(e)
+                raise
+
+    # Run a write query in a managed transaction, which the driver retries on transient errors.
+    # Unlike run_query, errors are raised so callers can report them
+    def run_write_transaction(self, query, parameters=None):
+        unit_of_work = self._active_unit_of_work()
+        if unit_of_work is not None:
+            return unit_of_work.run(query, parameters)
+
+        with self._session() as session:
+            return _execute(session, WRITE_ACCESS, query, parameters)
+
+    # Run a list query, streaming the records when the JSON request asks for it
+    def run_list_query(self, query, parameters, json_request):
+        if json_request.get("stream"):
+            return self.stream_query(query, parameters)
+        return self.run_read_query(query, parameters)
+
+class AsyncNeo4jConnection:
+    def __init__(self, uri, username, password, **pool_config):
+        self._uri = uri
+        self._username = username
+        self._driver = get_async_driver(uri, username, password, **pool_config)
+
+    # Explicitly shut down the shared async driver, closing it for every entity class using it
+    async def close(self):
+        await close_async_driver(self._uri, self._username)
+
+    # Async counterpart of Neo4jConnection.unit_of_work
+    @asynccontextmanager
+    async def unit_of_work(self):
+        async with self._session() as session:
+            transaction = await session.begin_transaction()
+            unit_of_work = AsyncUnitOfWork(self._driver, transaction)
+            token = _current_unit_of_work.set(unit_of_work)
+            try:
+                yield unit_of_work
+                await transaction.commit()
+            except BaseException:
+                await transaction.rollback()
+                raise
+            finally:
+                _current_unit_of_work.reset(token)
+                await transaction.close()
+            unit_of_work.run_after_commit()
+
+    # Run every query issued inside the block under EXPLAIN or PROFILE and collect the plans
+    # in the yielded PlanCapture; combine with a rolled-back unit of work to profile writes
+    def capture_plans(self, mode="PROFILE"):
+        return capture_plans(mode)
+
+    # Read your own writes inside the block; a plain with block works in async code too
+    def causal_context(self, token=None):
+        return causal_context(token)
+
+    # Return the open unit of work if it belongs to this connection's driver
+    def _active_unit_of_work(self):
+        unit_of_work = _current_unit_of_work.get()
+        if unit_of_work is not None and unit_of_work.driver is self._driver:
+            return unit_of_work
+        return None
+
+    @asynccontextmanager
+    async def _session(self, **config):
+        context = _current_causal_context.get()
+        if context is None:
+            async with self._driver.session(**config) as session:
+                yield session
+            return
+
+        started = context.bookmarks
+        async with self._driver.session(bookmarks=started, **config) as session:
+            yield session
+            context.update(started, await session.last_bookmarks())
+
+    # Async counterpart of Neo4jConnection.run_query
+    async def run_query(self, query, parameters=None, access_mode=WRITE_ACCESS):
+        # Inside a unit of work, errors propagate so the whole transaction rolls back
+        unit_of_work = self._active_unit_of_work()
+        if unit_of_work is not None:
+            return await unit_of_work.run(query, parameters)
+
+        records = None
+        try:
+            # Borrow a pooled connection for the duration of the query
+            async with self._session() as session:
+                records = await _async_execute(session, access_mode, query, parameters)  # Fetch all records and store them in a list
 
         except Exception as e:
-            print("Error:", e)
-        finally:
-            if self._driver:
-                self._driver.close()
-                return records
\ No newline at end of file
+            logger.error("Query failed: %s", e)
+        return records
+
+    async def run_read_query(self, query, parameters=None):
+        return await self.run_query(query, parameters, READ_ACCESS)
+
+    # Yield records as they arrive from the server instead of materialising the whole result.
+    # Streams are read-only and routed to followers, but not retried once records were yielded
+    def stream_query(self, query, parameters=None, fetch_size=None):
+        return self._stream_records(query, parameters, _method_for_metrics(), fetch_size)
+
+    async def _stream_records(self, query, parameters, method, fetch_size=None):
+        unit_of_work = self._active_unit_of_work()
+        if unit_of_work is not None:
+            for record in await unit_of_work.run(query, parameters):
+                yield record
+            return
+
+        config = {"fetch_size": fetch_size} if fetch_size else {}
+        async with self._session(default_access_mode=READ_ACCESS, **config) as session:
+            if current_capture() is not None:
+                for record in await _async_fetch(session, query, parameters, method):
+                    yield record
+                return
+            observation = start_observation(query, method)
+            try:
+                result = await session.run(query, parameters=parameters)
+                if observation is not None:
+                    observation.started()
+                count = 0
+                async for record in result:
+                    count += 1
+                    yield record
+                if observation is not None:
+                    observation.finish(await result.consume(), count)
+            except Exception as e:
+                if observation is not None:
+                    observation.fail(e)
+                raise
+
+    # Async counterpart of Neo4jConnection.run_write_transaction
+    async def run_write_transaction(self, query, parameters=None):
+        unit_of_work = self._active_unit_of_work()
+        if unit_of_work is not None:
+            return await unit_of_work.run(query, parameters)
+
+        async with self._session() as session:
+            return await _async_execute(session, WRITE_ACCESS, query, parameters)
+
+    # Run a list query, returning an async generator when the JSON request asks for streaming
+    async def run_list_query(self, query, parameters, json_request):
+        if json_request.get("stream"):
+            return self.stream_query(query, parameters)
+        return await self.run_read_query(query, parameters)
@@ -0,0 +1,98 @@
+# Helpers for EMPLOYMENT queries shared by Journalist and Company.
+#
+# Alongside the EMPLOYMENT history every journalist keeps one CURRENT_EMPLOYER relationship per
+# company they have a record with that has not ended yet. Its since and until hold the
+# earliest start and latest end of those records, null when any of them is open, so "who works
+# here now" only expands current links instead of the whole employment history. Links are
+# kept when the records end; readers compare since and until with the date they ask about.
+from datetime import date
+from neo4j.time import Date
+
+# Conditions on an employment relationship from the JSON request: "current_only" keeps the
+# records running on "as_of" (today by default), "from_date" and "to_date" keep the records
+# overlapping that period. Missing start and end dates count as open-ended
+def employment_conditions(variable, json_request):
+    conditions = []
+    if json_request.get("current_only"):
+        conditions.append(f"({variable}.start_date IS NULL OR {variable}.start_date <= $as_of)")
+        conditions.append(f"({variable}.end_date IS NULL OR {variable}.end_date >= $as_of)")
+    if json_request.get("from_date") is not None:
+        conditions.append(f"({variable}.end_date IS NULL OR {variable}.end_date >= $from_date)")
+    if json_request.get("to_date") is not None:
+        conditions.append(f"({variable}.start_date IS NULL OR {variable}.start_date <= $to_date)")
+    return conditions
+
+# Conditions keeping CURRENT_EMPLOYER links that cover $as_of
+def current_employer_conditions(variable):
+    return [
+        f"({variable}.since IS NULL OR {variable}.since <= $as_of)",
+        f"({variable}.until IS NULL OR {variable}.until >= $as_of)"
+    ]
+
+# MATCH clauses for the employment records between person and company, anchored on the uid of
+# one of them. With "current_only" the current links are matched first, so only the records of
+# current employees are expanded
+def employment_match(person, company, anchor, json_request):
+    person_variable = person.split(":")[0]
+    company_variable = company.split(":")[0]
+    conditions = employment_conditions("employment", json_request)
+
+    if not json_request.get("current_only"):
+        conditions.insert(0, f"{anchor}.uid = $uid")
+        return (
+            f"MATCH ({person})-[employment:EMPLOYMENT]->({company}) "
+            "WHERE " + " AND ".join(conditions) + " "
+        )
+
+    return (
+        f"MATCH ({person})-[current:CURRENT_EMPLOYER]->({company}) "
+        "WHERE " + " AND ".join([f"{anchor}.uid = $uid"] + current_employer_conditions("current")) + " "
+        f"MATCH ({person_variable})-[employment:EMPLOYMENT]->({company_variable}) "
+        "WHERE " + " AND ".join(conditions) + " "
+    )
+
+def _as_date(value):
+    if value is None or isinstance(value, (date, Date)):
+        return value
+    return Date.from_iso_format(value)
+
+def employment_parameters(json_request):
+    return {
+        "as_of": _as_date(json_request.get("as_of")) or date.today(),
+        "from_date": _as_date(json_request.get("from_date")),
+        "to_date": _as_date(json_request.get("to_date"))
+    }
+
+# Subquery recomputing the CURRENT_EMPLOYER links of person from the records that have not
+# ended. Importing company as well limits it to that one employer
+def current_employer_update(person, company=None):
+    imported = f"{person}, {company}" if company else person
+    company = company or "company"
+    return (
+        "CALL { "
+        f"WITH {imported} "
+        f"MATCH ({person})-[employment:EMPLOYMENT]->({company}:Company) "
+        "WHERE employment.end_date IS NULL OR employment.end_date >= date() "
+        f"WITH {person}, {company}, "
+        "CASE WHEN count(employment) > count(employment.start_date) THEN null ELSE min(employment.start_date) END AS since, "
+        "CASE WHEN count(employment) > count(employment.end_date) THEN null ELSE max(employment.end_date) END AS until "
+        f"MERGE ({person})-[current:CURRENT_EMPLOYER]->({company}) "
+        "SET current.since = since, current.until = until "
+        "} "
+    )
+
+# Rebuild the CURRENT_EMPLOYER links from the employment history, for one journalist or all of
+# them when uid is None, dropping the links whose records have all ended
+def refresh_current_employers_query(uid=None):
+    query = (
+        "MATCH (journalist:Journalist) "
+        + ("WHERE journalist.uid = $uid " if uid is not None else "")
+        + "CALL { "
+        "WITH journalist "
+        "MATCH (journalist)-[stale:CURRENT_EMPLOYER]->() "
+        "DELETE stale "
+        "} "
+        + current_employer_update("journalist")
+        + "RETURN count(journalist) AS updated"
+    )
+    return query, {"uid": uid}
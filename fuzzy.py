@@ -0,0 +1,133 @@
+from media.pagination import is_paginated, keyset_filter, keyset_order, keyset_parameters
+from media.query_builder import canonical_labels, industry_filter
+from media.rows import return_item
+import re
+
+# Shortest piece of the name searched through the full-text index. Shorter pieces occur in
+# so many indexed terms that the shortlist would be most of the label
+MIN_PIECE_LENGTH = 3
+
+# Runs of characters the full-text analyzer keeps inside one lower-cased token
+TOKEN_CHARACTERS = re.compile(r"[^\W_]+")
+
+# Split the name into max_distance + 1 disjoint pieces, as long as possible, each inside one
+# run of TOKEN_CHARACTERS. Returns None when the pieces would be shorter than MIN_PIECE_LENGTH
+def name_pieces(name, max_distance):
+    runs = TOKEN_CHARACTERS.findall(name.lower())
+    count = int(max_distance or 0) + 1
+    length = max((len(run) for run in runs), default=0)
+    while length >= MIN_PIECE_LENGTH and sum(len(run) // length for run in runs) < count:
+        length -= 1
+    if length < MIN_PIECE_LENGTH:
+        return None
+
+    pieces = []
+    for run in runs:
+        pieces.extend(run[start:start + length] for start in range(0, len(run) - length + 1, length))
+    return pieces[:count]
+
+# Build the full-text search string that shortlists every node within max_distance of the
+# name or the reversed name, or None when the name is too short to shortlist.
+#
+# A value within k edits of the name still contains at least one of k + 1 disjoint pieces of
+# it, since each edit breaks at most one piece. Pieces never span a token boundary, so each
+# one is inside a single indexed term and a "*piece*" wildcard finds it. The shortlist is a
+# superset of the exact filter whatever max_distance and however the stored name is split
+# into terms. Unlike "term~2" fuzzy queries it is not cut at Lucene's 50 term expansions.
+# The wildcards are matched against the term dictionary, so their cost follows the number of
+# distinct indexed terms, not the number of nodes
+def lucene_shortlist_terms(name, max_distance):
+    terms = []
+    for value in (name, " ".join(reversed(name.split()))):
+        pieces = name_pieces(value, max_distance)
+        if pieces is None:
+            return None
+        terms.extend(f"*{piece}*" for piece in pieces)
+    return " OR ".join(dict.fromkeys(terms))
+
+# Whether a search must scan every node instead of shortlisting through the full-text index:
+# when "exhaustive" is set or the name is too short for its max_distance (see name_pieces),
+# e.g. "li" within 2 edits, which any value of up to four characters satisfies
+def exhaustive_search(name, max_distance, json_request):
+    if json_request.get("exhaustive"):
+        return True
+    return lucene_shortlist_terms(name, max_distance) is None
+
+# Nodes of one label within max_distance of the name, as the clauses up to a WITH of variable
+# and one edit distance per alias. Candidates are shortlisted from the full-text index unless
+# exhaustive_search says otherwise, kept when they carry every label of industry_list, then
+# filtered by the exact apoc.text.distance. Shared by the find_* searches and search_all, and
+# takes its parameters from fuzzy_parameters
+def fuzzy_candidates(variable, label, index_name, distances, json_request, industry_list=None):
+    name = json_request.get("name")
+
+    # Shortlist candidates
+    if exhaustive_search(name, json_request.get("max_distance"), json_request):
+        query = f"MATCH ({variable}:{label}) "
+    else:
+        query = (
+            f"CALL db.index.fulltext.queryNodes('{index_name}', $search_terms"
+            + (", {limit: $candidate_limit}" if json_request.get("candidate_limit") else "")
+            + f") YIELD node AS {variable} "
+            f"WHERE {variable}:{label} "
+        )
+
+    # If the industries are specified, only keep candidates with those labels
+    if industry_list:
+        query += f"WITH {variable} " + industry_filter(variable)
+
+    # Compute the exact edit distances on the shortlist only
+    query += f"WITH {variable}, " + ", ".join(
+        f"apoc.text.distance(toLower({variable}.{prop}), toLower(${name_parameter})) AS {alias}"
+        for alias, prop, name_parameter in distances
+    ) + " "
+    query += "WHERE " + " OR ".join(f"{alias} <= $max_distance" for alias, _, _ in distances) + " "
+    return query
+
+# Parameters of fuzzy_candidates
+def fuzzy_parameters(json_request, industry_list=None):
+    name = json_request.get("name")
+    max_distance = json_request.get("max_distance")
+    return {
+        "search_terms": lucene_shortlist_terms(name, max_distance),
+        "candidate_limit": json_request.get("candidate_limit"),
+        "name": name,
+        "reversed_name": " ".join(reversed(name.split())),
+        "max_distance": max_distance,
+        "industry_list": list(canonical_labels(industry_list))
+    }
+
+# Build a ranked fuzzy name search over one label.
+#
+# Candidates are shortlisted from the full-text index, then the exact apoc.text.distance
+# filter is applied to the shortlist only, so the cost follows the number of matches rather
+# than the number of nodes. distances is a list of (alias, property, name_parameter) where
+# name_parameter is "name" or "reversed_name"; a node matches when any alias is within
+# max_distance. Names too short for their max_distance scan every node with the label
+# instead (see exhaustive_search).
+def fuzzy_search_query(variable, label, index_name, distances, json_request, industry_list=None, return_distances=False):
+    top_k = json_request.get("top_k")
+    aliases = [alias for alias, _, _ in distances]
+    query = fuzzy_candidates(variable, label, index_name, distances, json_request, industry_list)
+
+    return_clause = "RETURN " + return_item(variable, label, json_request)
+    if return_distances:
+        return_clause += ", " + ", ".join(aliases)
+
+    # Keyset pages are ordered by uid; otherwise rank by the closest distance and keep the top k
+    if is_paginated(json_request):
+        query += keyset_filter(variable, json_request)
+        query += return_clause
+        query += keyset_order(variable, json_request)
+    else:
+        query += (
+            f"WITH {variable}, {', '.join(aliases)}, apoc.coll.min([{', '.join(aliases)}]) AS distance "
+            f"ORDER BY distance, {', '.join(aliases)} "
+            + ("LIMIT $top_k " if top_k is not None else "")
+            + return_clause
+        )
+
+    parameters = fuzzy_parameters(json_request, industry_list)
+    parameters["top_k"] = top_k
+    parameters.update(keyset_parameters(json_request))
+    return query, parameters
@@ -1,272 +1,559 @@
-from media.connection import Neo4jConnection
+from media.cache import cache_node, cached_node, invalidate_facets, invalidate_label, invalidate_nodes
+from media.bulk import DEFAULT_BATCH_SIZE, async_bulk_create, async_bulk_create_relationships, bulk_create, bulk_create_query, bulk_create_relationships
+from media.connection import AsyncNeo4jConnection, Neo4jConnection, on_success
+from media.employment import current_employer_update, employment_match, employment_parameters, refresh_current_employers_query
+from media.fuzzy import fuzzy_search_query
+from media.name_index import get_name_index, update_name_index
+from media.pagination import keyset_filter, keyset_order, keyset_parameters
+from media.query_builder import canonical_labels, escape_label, format_labels, industry_filter, label_diff_query
+from media.rows import employment_rows, node_rows, relationship_return, return_item, EmploymentRow
 from datetime import datetime, date
+from functools import lru_cache
 from neo4j.time import Date
 import uuid
 
-class Journalist(Neo4jConnection):
-    def __init__(self, uri, username, password):
-        Neo4jConnection.__init__(self, uri, username, password)
+# Query builders shared by Journalist and AsyncJournalist. Each returns (query, parameters)
 
-    # api/journalists GET Fetch companies based on name and specified industries
-    def find_journalists(self, json_request):
-        # Extract data from the JSON
-        name = json_request.get("name")
-        max_distance = json_request.get("max_distance")
-        industry_list = json_request.get("industry_list")
-
-        # Construct the query
-        query = (
-            "MATCH (journalist:Journalist"
+# Edit distances a name search compares, as (alias, property, name parameter)
+NAME_DISTANCES = [
+    ("fn_distance", "first_name", "name"),
+    ("ln_distance", "last_name", "name")
+]
+
+def find_journalists_query(json_request):
+    # Extract data from the JSON
+    name = json_request.get("name")
+    industry_list = json_request.get("industry_list")
+
+    # If a name is provided, conduct an index-backed fuzzy search
+    if name:
+        return fuzzy_search_query(
+            "journalist", "Journalist", "journalist_names", NAME_DISTANCES, json_request,
+            industry_list=industry_list
         )
 
-        # If the industries are specified, add them to the query in the form of labels
-        if industry_list:
-            labels = ":".join(industry_list)
-            query += f":{labels}"
-
-        query += ") "
-
-        # If a name is provided, conduct a fuzzy search
-        if name:
-            query = (
-            "MATCH (journalist:Journalist) "
-            "WITH journalist, "
-            "     apoc.text.distance(toLower(journalist.first_name), toLower($name)) AS fn_distance, "
-            "     apoc.text.distance(toLower(journalist.last_name), toLower($name)) AS ln_distance, "
-            "     apoc.text.distance(toLower(journalist.first_name), toLower($reversed_name)) AS reversed_fn_distance, "
-            "     apoc.text.distance(toLower(journalist.last_name), toLower($reversed_name)) AS reversed_ln_distance "
-            "WHERE fn_distance <= $max_distance OR ln_distance <= $max_distance "
-            )
-
-        query += "RETURN journalist"
-        
-        parameters = {
-            "name": name,
-            "reversed_name": " ".join(reversed(name.split())) if name else "",
-            "max_distance": max_distance
+    # Construct the query
+    query = "MATCH (journalist:Journalist) "
+
+    # If the industries are specified, filter on them through a parameter
+    if industry_list:
+        query += industry_filter("journalist")
+
+    query += keyset_filter("journalist", json_request)
+    query += "RETURN " + return_item("journalist", "Journalist", json_request)
+    query += keyset_order("journalist", json_request)
+
+    parameters = keyset_parameters(json_request)
+    parameters["industry_list"] = list(canonical_labels(industry_list))
+    return query, parameters
+
+def add_journalist_query(json_request):
+    # Generate a unique ID
+    custom_id = str(uuid.uuid4())
+
+    # Format the birthdate str
+    birthdate = datetime.strptime(json_request.get("birthdate"), "%Y-%m-%d").date()
+
+    # Extract attributes from the JSON object
+    parameters = {
+        "uid": custom_id,
+        "first_name": json_request.get("first_name"),
+        "last_name": json_request.get("last_name"),
+        "birthdate": birthdate,
+        "description": json_request.get("description"),
+        "email": json_request.get("email"),
+        "mobile_num": json_request.get("mobile_num")
+    }
+
+    # Format the industry labels in canonical order
+    industries = json_request.get("industries", [])
+    formatted_industries = format_labels(industries)
+
+    query = (
+        "CREATE (journalist:Journalist {"
+        "uid: $uid,"
+        "first_name: $first_name,"
+        "last_name: $last_name,"
+        "birthdate: date($birthdate),"
+        "description: $description,"
+        "email: $email,"
+        "mobile_num: $mobile_num"
+        "})"
+        + (f"SET journalist{formatted_industries} " if formatted_industries else " ")  # Add labels using SET clause
+        + "RETURN journalist"
+    )
+    return query, parameters
+
+# Prepare one journalist for bulk creation, returning (properties, industries)
+def journalist_row(json_request):
+    properties = {
+        "uid": str(uuid.uuid4()),
+        "first_name": json_request.get("first_name"),
+        "last_name": json_request.get("last_name"),
+        "birthdate": date.fromisoformat(json_request.get("birthdate")),
+        "description": json_request.get("description"),
+        "email": json_request.get("email"),
+        "mobile_num": json_request.get("mobile_num")
+    }
+    return properties, json_request.get("industries", [])
+
+def find_journalist_by_uid_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
+
+    # Construct query string
+    query = (
+        "MATCH (journalist:Journalist) "
+        "WHERE journalist.uid = $uid "
+        "RETURN journalist"
+    )
+    return query, {"uid": uid}
+
+# Remove and add industry labels in a single statement, for one uid or a list of uids
+def update_journalist_industries_query(json_request):
+    return label_diff_query(
+        "journalist", "Journalist",
+        uid=json_request.get("uid"),
+        labels_to_remove=json_request.get("industries_to_remove"),
+        labels_to_add=json_request.get("new_industry_list"),
+        uids=json_request.get("uids")
+    )
+
+def add_journalist_industries_query(uid, new_industry_list):
+    return label_diff_query("journalist", "Journalist", uid=uid, labels_to_add=new_industry_list)
+
+def remove_journalist_industries_query(uid, industries_to_remove):
+    return label_diff_query("journalist", "Journalist", uid=uid, labels_to_remove=industries_to_remove)
+
+def update_journalist_properties_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
+    new_properties = json_request.get("new_properties")
+
+    # Format the birthdate property as a Neo4j date
+    if "birthdate" in new_properties:
+        new_properties["birthdate"] = Date.from_iso_format(new_properties["birthdate"])
+
+    # Construct query string
+    query = (
+        "MATCH (journalist:Journalist) "
+        "WHERE journalist.uid = $uid "
+        "SET journalist += $new_properties "
+        "RETURN journalist"
+    )
+    parameters = {"uid": uid, "new_properties": new_properties}
+    return query, parameters
+
+def add_employment_record_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
+    company_uid = json_request.get("company_uid")
+    new_properties = json_request.get("relationship_properties")
+
+    # Validate relationship properties
+    if not isinstance(new_properties, dict):
+        raise ValueError("Relationship properties must be a dictionary.")
+
+    # Format the start and end date properties as a Neo4j date
+    if "start_date" in new_properties:
+        new_properties["start_date"] = Date.from_iso_format(new_properties["start_date"])
+    if "end_date" in new_properties:
+        new_properties["end_date"] = Date.from_iso_format(new_properties["end_date"])
+
+    # Construct query string, refreshing the journalist's current link to the company
+    query = (
+        "MATCH (journalist:Journalist) "
+        "WHERE journalist.uid = $uid "
+        "MATCH (company:Company) WHERE company.uid = $company_uid "
+        "CREATE (journalist)-[r:EMPLOYMENT]->(company) SET r = $new_properties "
+        "WITH r, journalist, company "
+        + current_employer_update("journalist", "company")
+        + "RETURN r, journalist, company"
+    )
+    parameters = {
+        "uid": uid,
+        "company_uid": company_uid,
+        "new_properties": new_properties
+    }
+    return query, parameters
+
+# Employment records of a journalist, optionally only the current ones or the ones overlapping
+# a period (see media.employment)
+def get_all_employment_records_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+
+    # Construct query string
+    query = (
+        employment_match("journalist:Journalist", "company", "journalist", json_request)
+        + keyset_filter("company", json_request, "employment")
+        + relationship_return(
+            json_request, "employment", EmploymentRow,
+            [("journalist", "Journalist"), ("company", "Company")], parent="journalist"
+        )
+        + keyset_order("company", json_request, "employment")
+    )
+    parameters = {"uid": uid}
+    parameters.update(keyset_parameters(json_request))
+    parameters.update(employment_parameters(json_request))
+    return query, parameters
+
+# Author of a note reduced to its uid and a display name
+NOTE_AUTHOR_SUMMARY = (
+    "author {.uid, name: coalesce(author.first_name + ' ' + author.last_name, "
+    "author.company_name, author.medialist_name)}"
+)
+
+# Labels bulk note imports look authors up by unless an author_label is given
+NOTE_AUTHOR_LABELS = ("Journalist", "Company")
+
+# MATCH for the author of a note, typed by one label or a sequence of alternative labels when
+# the caller knows them, so the lookup can seek the uid index instead of scanning every node
+def note_author_match(author_label, uid_expression):
+    labels = [author_label] if isinstance(author_label, str) else list(author_label or ())
+    label = ":" + "|".join(escape_label(label) for label in labels) if labels else ""
+    return f"MATCH (author{label}) WHERE author.uid = {uid_expression} "
+
+# Notes on a journalist, newest first, each with its note_id. With "limit" the notes come in
+# pages: pass the creation_date and note_id of the last note received as "before" to fetch
+# the next page. "author_summary" returns the author's uid and name instead of the whole
+# node, and only the uid of the journalist
+def get_all_notes_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+    before = json_request.get("before")
+
+    # Construct query string
+    query = (
+        "MATCH (author)-[note:NOTE]->(journalist:Journalist) "
+        "WHERE journalist.uid = $uid "
+    )
+    if before is not None:
+        query += (
+            "AND (note.creation_date < $before_date "
+            "OR (note.creation_date = $before_date AND elementId(note) < $before_id)) "
+        )
+    if json_request.get("author_summary"):
+        query += f"RETURN note, journalist {{.uid}} AS journalist, {NOTE_AUTHOR_SUMMARY} AS author, "
+    else:
+        query += "RETURN note, journalist, author, "
+    query += "elementId(note) AS note_id ORDER BY note.creation_date DESC, note_id DESC"
+    if json_request.get("limit") is not None:
+        query += " LIMIT $limit"
+
+    parameters = {"uid": uid, "limit": json_request.get("limit")}
+    if before is not None:
+        before_date = before.get("creation_date")
+        parameters["before_date"] = Date.from_iso_format(before_date) if isinstance(before_date, str) else before_date
+        parameters["before_id"] = before.get("note_id")
+    return query, parameters
+
+def create_new_note_for_journalist_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+    author_uid = json_request.get("author_uid")
+    creation_date = date.today()
+    content = json_request.get("content")
+
+    # Construct query string
+    query = (
+        "MATCH (journalist:Journalist) "
+        "WHERE journalist.uid = $uid "
+        + note_author_match(json_request.get("author_label"), "$author_uid")
+        + "CREATE (author)-[r:NOTE]->(journalist) SET r = $note_properties "
+        "RETURN r, journalist, author"
+    )
+
+    parameters = {
+        "uid": uid,
+        "author_uid": author_uid,
+        "note_properties": {
+            "creation_date": creation_date,
+            "content": content
+        }
+    }
+    return query, parameters
+
+# Prepare one note for bulk import from {"uid", "author_uid", "content", "creation_date"}, where
+# creation_date defaults to today
+def note_row(json_request):
+    if not json_request.get("uid") or not json_request.get("author_uid"):
+        raise ValueError("A note needs a journalist uid and an author_uid")
+    creation_date = json_request.get("creation_date")
+    return {
+        "uid": json_request["uid"],
+        "author_uid": json_request["author_uid"],
+        "note": {
+            "creation_date": date.fromisoformat(creation_date) if creation_date else date.today(),
+            "content": json_request.get("content")
         }
-        return self.run_query(query, parameters)
+    }
+
+# Authors are matched by author_label, or by NOTE_AUTHOR_LABELS when it is not given, so every
+# row seeks a uid index
+@lru_cache(maxsize=16)
+def bulk_create_notes_query(author_label=None):
+    return (
+        "UNWIND $rows AS row "
+        "MATCH (journalist:Journalist) WHERE journalist.uid = row.uid "
+        + note_author_match(author_label or NOTE_AUTHOR_LABELS, "row.author_uid")
+        + "CREATE (author)-[note:NOTE]->(journalist) SET note = row.note "
+        "RETURN row.index AS index"
+    )
+
+def node_has_label_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+    label = json_request.get("label")
+
+    # Construct query string
+    query = (
+        "MATCH (node) "
+        "WHERE node.uid = $uid AND $label IN labels(node) "
+        "RETURN COUNT(node) > 0 AS has_label"
+    )
+    parameters = {"uid": uid, "label": label}
+    return query, parameters
+
+class Journalist(Neo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        Neo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/journalists GET Fetch companies based on name and specified industries
+    def find_journalists(self, json_request):
+        # Answer name searches from the in-memory index when it is enabled. It is only loaded
+        # outside a unit of work; until then the search runs in the database
+        index = get_name_index("Journalist") if json_request.get("name") else None
+        if index is not None and index.needs_load() and self._active_unit_of_work() is None:
+            index.load(self.run_read_query(*index.load_query()))
+        if index is not None and index.loaded:
+            query, parameters = index.search_query("journalist", json_request)
+        else:
+            query, parameters = find_journalists_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "journalist", "Journalist") if json_request.get("rows") else records
 
     # api/journalists POST Add a new journalist to the database
     def add_journalist(self, json_request):
-        # Generate a unique ID
-        custom_id = str(uuid.uuid4())
-
-        # Format the birthdate str
-        birthdate = datetime.strptime(json_request.get("birthdate"), "%Y-%m-%d").date()
-
-        # Extract attributes from the JSON object
-        parameters = {
-            "uid": custom_id,
-            "first_name": json_request.get("first_name"),
-            "last_name": json_request.get("last_name"),
-            "birthdate": birthdate,
-            "description": json_request.get("description"),
-            "email": json_request.get("email"),
-            "mobile_num": json_request.get("mobile_num")
-        }
-
-        # Create a list of labels formatted as strings
-        industries = json_request.get("industries", [])
-        formatted_industries = [f":{industry}" for industry in industries]
-
-        query = (
-            "CREATE (journalist:Journalist {"
-            "uid: $uid,"
-            "first_name: $first_name,"
-            "last_name: $last_name,"
-            "birthdate: date($birthdate),"
-            "description: $description,"
-            "email: $email,"
-            "mobile_num: $mobile_num"
-            "})"
-            "SET journalist" + "".join(formatted_industries) + " "  # Add labels using SET clause
-            "RETURN journalist"
-        )
+        query, parameters = add_journalist_query(json_request)
         result = self.run_query(query, parameters)
+        on_success(result, lambda: update_name_index("Journalist", parameters["uid"], parameters))
+        invalidate_facets("Journalist")
         return result
 
+    # Bulk import journalists from an iterable of JSON requests or a JSONL/CSV stream
+    def add_journalists_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+        report = bulk_create(
+            self, source, journalist_row,
+            lambda labels: bulk_create_query("journalist", "Journalist", labels),
+            batch_size, fmt,
+            on_created=lambda properties: update_name_index("Journalist", properties["uid"], properties)
+        )
+        if report["created"]:
+            invalidate_facets("Journalist")
+        return report
+
     # api/journalists/{id} GET Fetch a journalist based on ID
     def find_journalist_by_uid(self, json_request):
-        # Extract data from the JSON
+        # Serve from the read-through cache when it is enabled
         uid = json_request.get("uid")
-
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "RETURN journalist"
-        )
-        return self.run_query(query, {"uid": uid})
+        hit, records, version = cached_node("Journalist", uid)
+        if hit:
+            return records
+        records = self.run_read_query(*find_journalist_by_uid_query(json_request))
+        cache_node("Journalist", uid, records, version)
+        return records
 
     # api/journalists/{id} PUT Update a journalist's personal details
     def update_journalist_industries(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
-        new_industry_list = json_request.get("new_industry_list")
-        industries_to_remove = json_request.get("industries_to_remove")
-
-        # Remove specified industries
-        self.remove_journalist_industries(uid, industries_to_remove)
-
-        # Add specified industries
-        return self.add_journalist_industries(uid, new_industry_list)
+        result = self.run_query(*update_journalist_industries_query(json_request))
+        invalidate_nodes("Journalist", json_request.get("uid"), *(json_request.get("uids") or []))
+        invalidate_facets("Journalist")
+        return result
 
     def add_journalist_industries(self, uid, new_industry_list):
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "SET journalist:"
-            + ":".join(new_industry_list)
-            + " "
-            "RETURN journalist"
-        )
-        parameters = {"uid": uid}
-        return self.run_query(query, parameters)
+        result = self.run_query(*add_journalist_industries_query(uid, new_industry_list))
+        invalidate_nodes("Journalist", uid)
+        invalidate_facets("Journalist")
+        return result
 
     def remove_journalist_industries(self, uid, industries_to_remove):
-        # Format the list of labels to remove
-        industries_to_remove_str = ":".join(industries_to_remove)
-
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "REMOVE journalist:"
-            + industries_to_remove_str
-            + " "
-            "RETURN journalist"
-        )
-        parameters = {"uid": uid}
-        return self.run_query(query, parameters)
+        result = self.run_query(*remove_journalist_industries_query(uid, industries_to_remove))
+        invalidate_nodes("Journalist", uid)
+        invalidate_facets("Journalist")
+        return result
 
     def update_journalist_properties(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
-        new_properties = json_request.get("new_properties")
-
-        # Format the birthdate property as a Neo4j date
-        if "birthdate" in new_properties:
-            new_properties["birthdate"] = Date.from_iso_format(new_properties["birthdate"])
-
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "SET journalist += $new_properties "
-            "RETURN journalist"
-        )
-        parameters = {"uid": uid, "new_properties": new_properties}
-        return self.run_query(query, parameters)
+        query, parameters = update_journalist_properties_query(json_request)
+        result = self.run_query(query, parameters)
+        invalidate_nodes("Journalist", parameters["uid"])
+        on_success(result, lambda: update_name_index("Journalist", parameters["uid"], parameters["new_properties"]))
+        invalidate_facets("Journalist")
+        return result
 
     # api/journalists/{id}/history POST Add a new employment record for a journalist
     # should include role, start date and end date
     def add_employment_record(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
-        company_uid = json_request.get("company_uid")
-        new_properties = json_request.get("relationship_properties")
-        
-        # Format the start and end date properties as a Neo4j date
-        if "start_date" in new_properties:
-            new_properties["start_date"] = Date.from_iso_format(new_properties["start_date"])
-        if "end_date" in new_properties:
-            new_properties["end_date"] = Date.from_iso_format(new_properties["end_date"])
-
-        # Validate relationship properties
-        if not isinstance(new_properties, dict):
-            raise ValueError("Relationship properties must be a dictionary.")
-
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "MATCH (company:Company) WHERE company.uid = $company_uid "
-            "CREATE (journalist)-[r:EMPLOYMENT]->(company) SET r = $new_properties "
-            "RETURN r, journalist, company"
-        )
-        parameters = {
-            "uid": uid,
-            "company_uid": company_uid,
-            "new_properties": new_properties
-        }
-        return self.run_query(query, parameters)
+        result = self.run_query(*add_employment_record_query(json_request))
+        invalidate_nodes("Journalist", json_request.get("uid"))
+        invalidate_nodes("Company", json_request.get("company_uid"))
+        return result
 
     # api/journalists/{id}/history GET Get all employment records for a journalist
     def get_all_employment_records(self, json_request):
-        # Extract fields from JSON
-        uid = json_request.get("uid")
+        query, parameters = get_all_employment_records_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return employment_rows(records, "journalist", "company") if json_request.get("rows") else records
 
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist)-[employment:EMPLOYMENT]->(company) "
-            "WHERE journalist.uid = $uid "
-            "RETURN employment, journalist, company"
-        )
-        parameters = {"uid": uid}
-        result = self.run_query(query, parameters)
-        return result
+    # Backfill or repair the maintained CURRENT_EMPLOYER links
+    def refresh_current_employers(self, uid=None):
+        return self.run_write_transaction(*refresh_current_employers_query(uid))
 
     # api/journalists/{id}/notes GET Get all notes for a journalist
     def get_all_notes(self, json_request):
-        # Extract fields from JSON
-        uid = json_request.get("uid")
-
-        # Construct query string
-        query = (
-            "MATCH (author)-[note:NOTE]->(journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "RETURN note, journalist, author"
-        )
-        parameters = {"uid": uid}
-        result = self.run_query(query, parameters)
-        return result
+        query, parameters = get_all_notes_query(json_request)
+        return self.run_list_query(query, parameters, json_request)
 
     # api/journalists/{id}/notes POST Add a new note for a journalist
     def create_new_note_for_journalist(self, json_request):
-        # Extract fields from JSON
-        uid = json_request.get("uid")
-        author_uid = json_request.get("author_uid")
-        creation_date = date.today()
-        content = json_request.get("content")
-
-        # Construct query string
-        query = (
-            "MATCH (journalist:Journalist) "
-            "WHERE journalist.uid = $uid "
-            "MATCH (author) WHERE author.uid = $author_uid "
-            "CREATE (author)-[r:NOTE]->(journalist) SET r = $note_properties "
-            "RETURN r, journalist, author"
-        )
-
-        parameters = {
-            "uid": uid,
-            "author_uid": author_uid,
-            "note_properties": {
-                "creation_date": creation_date,
-                "content": content
-            }
-        }
-        result = self.run_query(query, parameters)
+        result = self.run_query(*create_new_note_for_journalist_query(json_request))
+        invalidate_nodes("Journalist", json_request.get("uid"))
         return result
 
-# Check if a node has a specific label
+    # Bulk import notes from an iterable of JSON requests or a JSONL/CSV stream. Authors are
+    # journalists or companies unless author_label names the one label they all share
+    def add_notes_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None, author_label=None):
+        report = bulk_create_relationships(self, source, note_row, bulk_create_notes_query(author_label), batch_size, fmt)
+        if report["created"]:
+            invalidate_label("Journalist")
+        return report
+
+    # Check if a node has a specific label
     def node_has_label(self, json_request):
-        # Extract fields from JSON
-        uid = json_request.get("uid")
-        label = json_request.get("label")
+        result = self.run_read_query(*node_has_label_query(json_request))
+
+        if result:
+            return result[0]["has_label"]
+        else:
+            return False
 
-        # Construct query string
-        query = (
-            "MATCH (node) "
-            "WHERE node.uid = $uid AND $label IN labels(node) "
-            "RETURN COUNT(node) > 0 AS has_label"
+class AsyncJournalist(AsyncNeo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        AsyncNeo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/journalists GET Fetch companies based on name and specified industries
+    async def find_journalists(self, json_request):
+        # Answer name searches from the in-memory index when it is enabled. It is only loaded
+        # outside a unit of work; until then the search runs in the database
+        index = get_name_index("Journalist") if json_request.get("name") else None
+        if index is not None and index.needs_load() and self._active_unit_of_work() is None:
+            index.load(await self.run_read_query(*index.load_query()))
+        if index is not None and index.loaded:
+            query, parameters = index.search_query("journalist", json_request)
+        else:
+            query, parameters = find_journalists_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "journalist", "Journalist") if json_request.get("rows") else records
+
+    # api/journalists POST Add a new journalist to the database
+    async def add_journalist(self, json_request):
+        query, parameters = add_journalist_query(json_request)
+        result = await self.run_query(query, parameters)
+        on_success(result, lambda: update_name_index("Journalist", parameters["uid"], parameters))
+        invalidate_facets("Journalist")
+        return result
+
+    # Bulk import journalists from an iterable of JSON requests or a JSONL/CSV stream
+    async def add_journalists_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+        report = await async_bulk_create(
+            self, source, journalist_row,
+            lambda labels: bulk_create_query("journalist", "Journalist", labels),
+            batch_size, fmt,
+            on_created=lambda properties: update_name_index("Journalist", properties["uid"], properties)
         )
-        parameters = {"node_id": node_id, "label": label}
-        result = self.run_query(query, parameters)
+        if report["created"]:
+            invalidate_facets("Journalist")
+        return report
+
+    # api/journalists/{id} GET Fetch a journalist based on ID
+    async def find_journalist_by_uid(self, json_request):
+        # Serve from the read-through cache when it is enabled
+        uid = json_request.get("uid")
+        hit, records, version = cached_node("Journalist", uid)
+        if hit:
+            return records
+        records = await self.run_read_query(*find_journalist_by_uid_query(json_request))
+        cache_node("Journalist", uid, records, version)
+        return records
+
+    # api/journalists/{id} PUT Update a journalist's personal details
+    async def update_journalist_industries(self, json_request):
+        result = await self.run_query(*update_journalist_industries_query(json_request))
+        invalidate_nodes("Journalist", json_request.get("uid"), *(json_request.get("uids") or []))
+        invalidate_facets("Journalist")
+        return result
+
+    async def add_journalist_industries(self, uid, new_industry_list):
+        result = await self.run_query(*add_journalist_industries_query(uid, new_industry_list))
+        invalidate_nodes("Journalist", uid)
+        invalidate_facets("Journalist")
+        return result
+
+    async def remove_journalist_industries(self, uid, industries_to_remove):
+        result = await self.run_query(*remove_journalist_industries_query(uid, industries_to_remove))
+        invalidate_nodes("Journalist", uid)
+        invalidate_facets("Journalist")
+        return result
+
+    async def update_journalist_properties(self, json_request):
+        query, parameters = update_journalist_properties_query(json_request)
+        result = await self.run_query(query, parameters)
+        invalidate_nodes("Journalist", parameters["uid"])
+        on_success(result, lambda: update_name_index("Journalist", parameters["uid"], parameters["new_properties"]))
+        invalidate_facets("Journalist")
+        return result
+
+    # api/journalists/{id}/history POST Add a new employment record for a journalist
+    async def add_employment_record(self, json_request):
+        result = await self.run_query(*add_employment_record_query(json_request))
+        invalidate_nodes("Journalist", json_request.get("uid"))
+        invalidate_nodes("Company", json_request.get("company_uid"))
+        return result
+
+    # api/journalists/{id}/history GET Get all employment records for a journalist
+    async def get_all_employment_records(self, json_request):
+        query, parameters = get_all_employment_records_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return employment_rows(records, "journalist", "company") if json_request.get("rows") else records
+
+    # Backfill or repair the maintained CURRENT_EMPLOYER links
+    async def refresh_current_employers(self, uid=None):
+        return await self.run_write_transaction(*refresh_current_employers_query(uid))
+
+    # api/journalists/{id}/notes GET Get all notes for a journalist
+    async def get_all_notes(self, json_request):
+        query, parameters = get_all_notes_query(json_request)
+        return await self.run_list_query(query, parameters, json_request)
+
+    # api/journalists/{id}/notes POST Add a new note for a journalist
+    async def create_new_note_for_journalist(self, json_request):
+        result = await self.run_query(*create_new_note_for_journalist_query(json_request))
+        invalidate_nodes("Journalist", json_request.get("uid"))
+        return result
+
+    # Bulk import notes from an iterable of JSON requests or a JSONL/CSV stream. Authors are
+    # journalists or companies unless author_label names the one label they all share
+    async def add_notes_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None, author_label=None):
+        report = await async_bulk_create_relationships(self, source, note_row, bulk_create_notes_query(author_label), batch_size, fmt)
+        if report["created"]:
+            invalidate_label("Journalist")
+        return report
+
+    # Check if a node has a specific label
+    async def node_has_label(self, json_request):
+        result = await self.run_read_query(*node_has_label_query(json_request))
 
         if result:
-            return True
+            return result[0]["has_label"]
         else:
             return False
\ No newline at end of file
@@ -1,191 +1,635 @@
-from media.connection import Neo4jConnection
+from media.cache import cache_node, cached_node, invalidate_facets, invalidate_label, invalidate_nodes
+from media.bulk import DEFAULT_BATCH_SIZE, async_bulk_create, async_write_records, batched, bulk_create, bulk_create_query, write_records
+from media.connection import AsyncNeo4jConnection, Neo4jConnection, on_success
+from media.employment import current_employer_conditions, employment_conditions, employment_parameters
+from media.fuzzy import fuzzy_search_query
+from media.name_index import get_name_index, update_name_index
+from media.pagination import keyset_filter, keyset_order, keyset_parameters
+from media.query_builder import canonical_labels, format_labels, industry_filter, label_diff_query
+from media.rows import membership_rows, node_fields, node_projection, node_rows, relationship_return, return_item, JournalistRow, MembershipRow
 from datetime import datetime, date
 from neo4j.time import Date
 import uuid
 
-class Medialist(Neo4jConnection):
-    def __init__(self, uri, username, password):
-        Neo4jConnection.__init__(self, uri, username, password)
+# Query builders shared by Medialist and AsyncMedialist. Each returns (query, parameters)
 
-    # api/medialists GET Fetch companies based on name and specified industries
-    def find_medialists(self, json_request):
-        # Extract data from the JSON
-        name = json_request.get("name")
-        max_distance = json_request.get("max_distance")
-        industry_list = json_request.get("industry_list")
+# Edit distances a name search compares, as (alias, property, name parameter)
+NAME_DISTANCES = [
+    ("fn_distance", "medialist_name", "name"),
+    ("reversed_fn_distance", "medialist_name", "reversed_name")
+]
 
-        # Construct the query
-        query = (
-            "MATCH (medialist:Medialist"
+def find_medialists_query(json_request):
+    # Extract data from the JSON
+    name = json_request.get("name")
+    industry_list = json_request.get("industry_list")
+
+    # If a name is provided, conduct an index-backed fuzzy search
+    if name:
+        return fuzzy_search_query(
+            "medialist", "Medialist", "medialist_names", NAME_DISTANCES, json_request,
+            industry_list=industry_list
         )
 
-        # If the industries are specified, add them to the query in the form of labels
-        if industry_list:
-            labels = ":".join(industry_list)
-            query += f":{labels}"
-
-        query += ") "
-
-        # If a name is provided, conduct a fuzzy search
-        if name:
-            query += (
-                "WITH medialist, "
-                "     apoc.text.distance(toLower(medialist.medialist_name), toLower($name)) AS fn_distance, "
-                "     apoc.text.distance(toLower(medialist.medialist_name), toLower($reversed_name)) AS reversed_fn_distance "
-                "WHERE fn_distance <= $max_distance OR reversed_fn_distance <= $max_distance "
-            )
-
-        query += "RETURN medialist"
-        
-        parameters = {
-            "name": name,
-            "reversed_name": " ".join(reversed(name.split())) if name else "",
-            "max_distance": max_distance
-        }
-        return self.run_query(query, parameters)
+    # Construct the query
+    query = "MATCH (medialist:Medialist) "
+
+    # If the industries are specified, filter on them through a parameter
+    if industry_list:
+        query += industry_filter("medialist")
+
+    query += keyset_filter("medialist", json_request)
+    query += "RETURN " + return_item("medialist", "Medialist", json_request)
+    query += keyset_order("medialist", json_request)
+
+    parameters = keyset_parameters(json_request)
+    parameters["industry_list"] = list(canonical_labels(industry_list))
+    return query, parameters
+
+def add_medialist_query(json_request):
+    # Generate a unique ID
+    custom_id = str(uuid.uuid4())
+
+    # Extract fields from the JSON
+    medialist_name = json_request.get("medialist_name")
+    description = json_request.get("description")
+
+    # Format the industry labels in canonical order
+    industries = json_request.get("industries", [])
+    formatted_industries = format_labels(industries)
+
+    query = (
+        "CREATE (medialist:Medialist {"
+        "uid: $uid,"
+        "medialist_name: $medialist_name,"
+        "creation_datetime: date($creation_datetime),"
+        "description: $description,"
+        "member_count: 0"
+        "})"
+        + (f"SET medialist{formatted_industries} " if formatted_industries else " ")  # Add labels using SET clause
+        + "RETURN medialist"
+    )
+    parameters = {
+        "uid": custom_id,
+        "medialist_name": medialist_name,
+        "creation_datetime": datetime.now(),
+        "description": description
+    }
+    return query, parameters
+
+# Prepare one medialist for bulk creation, returning (properties, industries)
+def medialist_row(json_request):
+    properties = {
+        "uid": str(uuid.uuid4()),
+        "medialist_name": json_request.get("medialist_name"),
+        "creation_datetime": date.today(),
+        "description": json_request.get("description"),
+        "member_count": 0
+    }
+    return properties, json_request.get("industries", [])
+
+def find_medialist_by_uid_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
+
+    # Construct query string
+    query = (
+        "MATCH (medialist:Medialist) "
+        "WHERE medialist.uid = $uid "
+        "RETURN medialist"
+    )
+    return query, {"uid": uid}
+
+# Remove and add industry labels in a single statement, for one uid or a list of uids
+def update_medialist_industries_query(json_request):
+    return label_diff_query(
+        "medialist", "Medialist",
+        uid=json_request.get("uid"),
+        labels_to_remove=json_request.get("industries_to_remove"),
+        labels_to_add=json_request.get("new_industry_list"),
+        uids=json_request.get("uids")
+    )
+
+def add_medialist_industries_query(uid, new_industry_list):
+    return label_diff_query("medialist", "Medialist", uid=uid, labels_to_add=new_industry_list)
+
+def remove_medialist_industries_query(uid, industries_to_remove):
+    return label_diff_query("medialist", "Medialist", uid=uid, labels_to_remove=industries_to_remove)
+
+def update_medialist_properties_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
+    new_properties = json_request.get("new_properties")
+
+    # Construct query string
+    query = (
+        "MATCH (medialist:Medialist) "
+        "WHERE medialist.uid = $uid "
+        "SET medialist += $new_properties "
+        "RETURN medialist"
+    )
+    parameters = {"uid": uid, "new_properties": new_properties}
+    return query, parameters
+
+# Adjust member_count by delta after a membership write. Lists whose count was never
+# maintained are seeded from their memberships, which already include the write
+def member_count_update(delta):
+    return (
+        f"SET medialist.member_count = coalesce(medialist.member_count {delta}, "
+        "COUNT { (medialist)<-[:INCLUDED]-() }) "
+    )
+
+def add_to_medialist_query(json_request):
+    # Extract data from the JSON
+    uid = json_request.get("uid")
+    medialist_uid = json_request.get("medialist_uid")
+    new_properties = json_request.get("relationship_properties")
+
+    # Validate relationship properties
+    if not isinstance(new_properties, dict):
+        raise ValueError("Relationship properties must be a dictionary.")
+
+    new_properties["creation_datetime"] = datetime.now()
+
+    # Construct query string
+    query = (
+        "MATCH (person) "
+        "WHERE person.uid = $uid "
+        "MATCH (medialist:Medialist) WHERE medialist.uid = $medialist_uid "
+        "CREATE (person)-[r:INCLUDED]->(medialist) SET r = $new_properties "
+        + member_count_update("+ 1")
+        + "RETURN r, person, medialist"
+    )
+    parameters = {
+        "uid": uid,
+        "medialist_uid": medialist_uid,
+        "new_properties": new_properties
+    }
+    return query, parameters
+
+# Add a batch of journalists to a medialist, skipping people who are already members.
+# MERGE returns one row per existing INCLUDED edge, so people are collapsed to one row each
+# before counting in case duplicate edges exist
+def add_many_to_medialist_query(medialist_uid, uids, new_properties):
+    query = (
+        "MATCH (medialist:Medialist) WHERE medialist.uid = $medialist_uid "
+        "UNWIND $uids AS uid "
+        "MATCH (person:Journalist) WHERE person.uid = uid "
+        "OPTIONAL MATCH (person)-[existing:INCLUDED]->(medialist) "
+        "WITH medialist, person, count(existing) > 0 AS already_included "
+        "MERGE (person)-[r:INCLUDED]->(medialist) "
+        "ON CREATE SET r = $new_properties "
+        "WITH DISTINCT medialist, person, already_included "
+        "WITH medialist, count(person) AS matched, "
+        "     sum(CASE WHEN already_included THEN 0 ELSE 1 END) AS added "
+        + member_count_update("+ added")
+        + "RETURN matched, added"
+    )
+    parameters = {
+        "medialist_uid": medialist_uid,
+        "uids": uids,
+        "new_properties": new_properties
+    }
+    return query, parameters
+
+# Remove a batch of journalists from a medialist. removed counts people, while the member count
+# drops by every deleted edge, duplicates included, as it counts INCLUDED edges
+def remove_many_from_medialist_query(medialist_uid, uids):
+    query = (
+        "MATCH (medialist:Medialist) WHERE medialist.uid = $medialist_uid "
+        "UNWIND $uids AS uid "
+        "MATCH (person:Journalist)-[r:INCLUDED]->(medialist) WHERE person.uid = uid "
+        "DELETE r "
+        "WITH medialist, count(DISTINCT person) AS removed, count(r) AS deleted "
+        + member_count_update("- deleted")
+        + "RETURN removed"
+    )
+    parameters = {"medialist_uid": medialist_uid, "uids": uids}
+    return query, parameters
+
+def get_all_in_medialist_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+
+    # Construct query string
+    query = (
+        "MATCH (person)-[included:INCLUDED]->(medialist) "
+        "WHERE medialist.uid = $uid "
+        + keyset_filter("person", json_request, "included")
+        + relationship_return(
+            json_request, "included", MembershipRow,
+            [("person", "Journalist"), ("medialist", "Medialist")], parent="medialist"
+        )
+        + keyset_order("person", json_request, "included")
+    )
+    parameters = {"uid": uid}
+    parameters.update(keyset_parameters(json_request))
+    return query, parameters
+
+# Current employer of each person on $as_of as employer {uid, company_name, role}. Employers
+# come from the maintained CURRENT_EMPLOYER links, with the role of the running EMPLOYMENT
+# without an end date, or ending latest, that started most recently (see media.employment)
+CURRENT_EMPLOYER_SUBQUERY = (
+    "CALL { "
+    "WITH person "
+    "OPTIONAL MATCH (person)-[current:CURRENT_EMPLOYER]->(company:Company) "
+    "WHERE " + " AND ".join(current_employer_conditions("current")) + " "
+    "OPTIONAL MATCH (person)-[employment:EMPLOYMENT]->(company) "
+    "WHERE " + " AND ".join(employment_conditions("employment", {"current_only": True})) + " "
+    "RETURN company {.uid, .company_name, role: employment.role} AS employer "
+    "ORDER BY employment IS NOT NULL DESC, employment.end_date IS NULL DESC, employment.start_date DESC "
+    "LIMIT 1 "
+    "} "
+)
+
+# Fetch a medialist once with its members collected server-side into a single record.
+# Members carry the requested "fields" (every field but industries by default), their
+# industries when "include_industries" is set, and their current employer on "as_of" (today
+# by default) when "include_employer" is set (see CURRENT_EMPLOYER_SUBQUERY).
+def get_medialist_detail_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+    fields = json_request.get("fields")
+    if fields is None:
+        fields = [field for field in node_fields(JournalistRow) if field != "industries"]
+    if json_request.get("include_industries"):
+        fields = list(fields) + ["industries"]
+
+    extra = ["included_at: included.creation_datetime"]
+
+    # Construct query string
+    query = (
+        "MATCH (medialist:Medialist) "
+        "WHERE medialist.uid = $uid "
+        "OPTIONAL MATCH (person)-[included:INCLUDED]->(medialist) "
+    )
+    if json_request.get("include_employer"):
+        query += CURRENT_EMPLOYER_SUBQUERY
+        extra.append("employer: employer")
+
+    query += (
+        f"WITH medialist, collect({node_projection('person', 'Journalist', fields, extra)}) AS members "
+        "RETURN medialist {.*, industries: [industry IN labels(medialist) WHERE industry <> 'Medialist']} AS medialist, members"
+    )
+    return query, {"uid": uid, "as_of": employment_parameters(json_request)["as_of"]}
+
+# Medialist summary with its member count, without touching the memberships. member_count is
+# maintained by the membership writes; lists created before it existed are counted on the fly.
+def get_medialist_summary_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+
+    # Construct query string
+    query = (
+        "MATCH (medialist:Medialist) "
+        "WHERE medialist.uid = $uid "
+        "RETURN medialist.uid AS uid, "
+        "       medialist.medialist_name AS medialist_name, "
+        "       medialist.description AS description, "
+        "       [industry IN labels(medialist) WHERE industry <> 'Medialist'] AS industries, "
+        "       coalesce(medialist.member_count, COUNT { (medialist)<-[:INCLUDED]-() }) AS member_count"
+    )
+    return query, {"uid": uid}
+
+# Members of a medialist as flat rows for export: the requested journalist "fields" (all of
+# them by default), included_at and, with "include_employer", the employer_uid, employer_name
+# and employer_role of their current employer on "as_of" (today by default). Returns
+# (query, parameters, columns)
+def export_medialist_query(json_request):
+    # Extract fields from JSON
+    uid = json_request.get("uid")
+    fields = node_fields(JournalistRow, json_request.get("fields"))
+
+    items = []
+    for field in fields:
+        if field == "industries":
+            items.append("[industry IN labels(person) WHERE industry <> 'Journalist'] AS industries")
+        else:
+            items.append(f"person.{field} AS {field}")
+    items.append("included.creation_datetime AS included_at")
+    columns = list(fields) + ["included_at"]
+
+    # Construct query string
+    query = (
+        "MATCH (medialist:Medialist) "
+        "WHERE medialist.uid = $uid "
+        "MATCH (person)-[included:INCLUDED]->(medialist) "
+    )
+    if json_request.get("include_employer"):
+        query += CURRENT_EMPLOYER_SUBQUERY
+        items += ["employer.uid AS employer_uid", "employer.company_name AS employer_name", "employer.role AS employer_role"]
+        columns += ["employer_uid", "employer_name", "employer_role"]
+    query += "RETURN " + ", ".join(items)
+    return query, {"uid": uid, "as_of": employment_parameters(json_request)["as_of"]}, columns
+
+# Recompute member_count from the memberships, for one medialist or all of them when uid is None
+def recount_medialist_members_query(uid=None):
+    query = (
+        "MATCH (medialist:Medialist) "
+        + ("WHERE medialist.uid = $uid " if uid is not None else "")
+        + "SET medialist.member_count = COUNT { (medialist)<-[:INCLUDED]-() } "
+        "RETURN count(medialist) AS updated"
+    )
+    return query, {"uid": uid}
+
+class Medialist(Neo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        Neo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/medialists GET Fetch companies based on name and specified industries
+    def find_medialists(self, json_request):
+        # Answer name searches from the in-memory index when it is enabled. It is only loaded
+        # outside a unit of work; until then the search runs in the database
+        index = get_name_index("Medialist") if json_request.get("name") else None
+        if index is not None and index.needs_load() and self._active_unit_of_work() is None:
+            index.load(self.run_read_query(*index.load_query()))
+        if index is not None and index.loaded:
+            query, parameters = index.search_query("medialist", json_request)
+        else:
+            query, parameters = find_medialists_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "medialist", "Medialist") if json_request.get("rows") else records
 
     # api/medialists POST Add a new media list to the database
     def add_medialist(self, json_request):
-        # Generate a unique ID
-        custom_id = str(uuid.uuid4())
-
-        # Extract fields from the JSON
-        medialist_name = json_request.get("medialist_name")
-        description = json_request.get("description")
-        creation_datetime = datetime.now()
-
-        # Create a list of labels formatted as strings
-        industries = json_request.get("industries", [])
-        formatted_industries = [f":{industry}" for industry in industries]
-
-        query = (
-            "CREATE (medialist:Medialist {"
-            "uid: $uid,"
-            "medialist_name: $medialist_name,"
-            "creation_datetime: date($creation_datetime),"
-            "description: $description"
-            "})"
-            "SET medialist" + "".join(formatted_industries) + " "  # Add labels using SET clause
-            "RETURN medialist"
-        )
-        parameters = {
-            "uid": custom_id,
-            "medialist_name": medialist_name,
-            "creation_datetime": datetime.now(),
-            "description": description
-        }
+        query, parameters = add_medialist_query(json_request)
         result = self.run_query(query, parameters)
+        on_success(result, lambda: update_name_index("Medialist", parameters["uid"], parameters))
+        invalidate_facets("Medialist")
         return result
 
+    # Bulk import medialists from an iterable of JSON requests or a JSONL/CSV stream
+    def add_medialists_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+        report = bulk_create(
+            self, source, medialist_row,
+            lambda labels: bulk_create_query("medialist", "Medialist", labels),
+            batch_size, fmt,
+            on_created=lambda properties: update_name_index("Medialist", properties["uid"], properties)
+        )
+        if report["created"]:
+            invalidate_facets("Medialist")
+        return report
+
     # api/medialists/{id} GET Fetch a medialist based on ID
     def find_medialist_by_uid(self, json_request):
-        # Extract data from the JSON
+        # Serve from the read-through cache when it is enabled
         uid = json_request.get("uid")
-
-        # Construct query string
-        query = (
-            "MATCH (medialist:Medialist) "
-            "WHERE medialist.uid = $uid "
-            "RETURN medialist"
-        )
-        return self.run_query(query, {"uid": uid})
+        hit, records, version = cached_node("Medialist", uid)
+        if hit:
+            return records
+        records = self.run_read_query(*find_medialist_by_uid_query(json_request))
+        cache_node("Medialist", uid, records, version)
+        return records
 
     # api/medialists/{id} PUT Update a journalist's personal details
     def update_medialist_industries(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
-        new_industry_list = json_request.get("new_industry_list")
-        industries_to_remove = json_request.get("industries_to_remove")
-
-        # Remove specified industries
-        self.remove_medialist_industries(uid, industries_to_remove)
-
-        # Add specified industries
-        return self.add_medialist_industries(uid, new_industry_list)
+        result = self.run_query(*update_medialist_industries_query(json_request))
+        invalidate_nodes("Medialist", json_request.get("uid"), *(json_request.get("uids") or []))
+        invalidate_facets("Medialist")
+        return result
 
     def add_medialist_industries(self, uid, new_industry_list):
-        # Construct query string
-        query = (
-            "MATCH (medialist:Medialist) "
-            "WHERE medialist.uid = $uid "
-            "SET medialist:"
-            + ":".join(new_industry_list)
-            + " "
-            "RETURN medialist"
-        )
-        parameters = {"uid": uid}
-        return self.run_query(query, parameters)
+        result = self.run_query(*add_medialist_industries_query(uid, new_industry_list))
+        invalidate_nodes("Medialist", uid)
+        invalidate_facets("Medialist")
+        return result
 
     def remove_medialist_industries(self, uid, industries_to_remove):
-        # Format the list of labels to remove
-        industries_to_remove_str = ":".join(industries_to_remove)
-
-        # Construct query string
-        query = (
-            "MATCH (medialist:Medialist) "
-            "WHERE medialist.uid = $uid "
-            "REMOVE medialist:"
-            + industries_to_remove_str
-            + " "
-            "RETURN medialist"
-        )
-        parameters = {"uid": uid}
-        return self.run_query(query, parameters)
+        result = self.run_query(*remove_medialist_industries_query(uid, industries_to_remove))
+        invalidate_nodes("Medialist", uid)
+        invalidate_facets("Medialist")
+        return result
 
     # api/medialists/{id}/details PUT Update a medialist’s properties
     def update_medialist_properties(self, json_request):
-        # Extract data from the JSON
-        uid = json_request.get("uid")
-        new_properties = json_request.get("new_properties")
-
-        # Construct query string
-        query = (
-            "MATCH (medialist:Medialist) "
-            "WHERE medialist.uid = $uid "
-            "SET medialist += $new_properties "
-            "RETURN medialist"
-        )
-        parameters = {"uid": uid, "new_properties": new_properties}
-        return self.run_query(query, parameters)
+        query, parameters = update_medialist_properties_query(json_request)
+        result = self.run_query(query, parameters)
+        invalidate_nodes("Medialist", parameters["uid"])
+        on_success(result, lambda: update_name_index("Medialist", parameters["uid"], parameters["new_properties"]))
+        invalidate_facets("Medialist")
+        return result
 
     # api/medialists/{id} POST Add a new person to the media list
     def add_to_medialist(self, json_request):
+        result = self.run_query(*add_to_medialist_query(json_request))
+        invalidate_nodes("Medialist", json_request.get("medialist_uid"))
+        return result
+
+    # api/medialists/{id}/members POST Add many people to the media list, returning counts
+    def add_many_to_medialist(self, json_request):
         # Extract data from the JSON
-        uid = json_request.get("uid")
         medialist_uid = json_request.get("medialist_uid")
-        new_properties = json_request.get("relationship_properties")
+        uids = list(dict.fromkeys(json_request.get("uids", [])))
+        new_properties = dict(json_request.get("relationship_properties") or {})
+        batch_size = json_request.get("batch_size", DEFAULT_BATCH_SIZE)
         new_properties["creation_datetime"] = datetime.now()
 
-        # Validate relationship properties
-        if not isinstance(new_properties, dict):
-            raise ValueError("Relationship properties must be a dictionary.")
-
-        # Construct query string
-        query = (
-            "MATCH (person) "
-            "WHERE person.uid = $uid "
-            "MATCH (medialist:Medialist) WHERE medialist.uid = $medialist_uid "
-            "CREATE (person)-[r:INCLUDED]->(medialist) SET r = $new_properties "
-            "RETURN r, person, medialist"
-        )
-        parameters = {
-            "uid": uid,
-            "medialist_uid": medialist_uid,
-            "new_properties": new_properties
-        }
-        return self.run_query(query, parameters)
+        counts = {"added": 0, "already_included": 0, "not_found": 0}
+        for batch in batched(uids, batch_size):
+            records = self.run_write_transaction(*add_many_to_medialist_query(medialist_uid, batch, new_properties))
+            matched = records[0]["matched"] if records else 0
+            added = (records[0]["added"] or 0) if records else 0
+            counts["added"] += added
+            counts["already_included"] += max(0, matched - added)
+            counts["not_found"] += max(0, len(batch) - matched)
+        invalidate_nodes("Medialist", medialist_uid)
+        return counts
+
+    # api/medialists/{id}/members DELETE Remove many people from the media list, returning counts
+    def remove_many_from_medialist(self, json_request):
+        # Extract data from the JSON
+        medialist_uid = json_request.get("medialist_uid")
+        uids = list(dict.fromkeys(json_request.get("uids", [])))
+        batch_size = json_request.get("batch_size", DEFAULT_BATCH_SIZE)
+
+        counts = {"removed": 0, "not_included": 0}
+        for batch in batched(uids, batch_size):
+            records = self.run_write_transaction(*remove_many_from_medialist_query(medialist_uid, batch))
+            removed = records[0]["removed"] if records else 0
+            counts["removed"] += removed
+            counts["not_included"] += max(0, len(batch) - removed)
+        invalidate_nodes("Medialist", medialist_uid)
+        return counts
 
     # api/medialists/{id}/all GET Get all people in a media list
     def get_all_in_medialist(self, json_request):
-        # Extract fields from JSON
+        query, parameters = get_all_in_medialist_query(json_request)
+        records = self.run_list_query(query, parameters, json_request)
+        return membership_rows(records) if json_request.get("rows") else records
+
+    # api/medialists/{id}/detail GET Get a media list and all its members as one record
+    def get_medialist_detail(self, json_request):
+        return self.run_read_query(*get_medialist_detail_query(json_request))
+
+    # api/medialists/{id}/summary GET Get a media list's details and member count without its members
+    def get_medialist_summary(self, json_request):
+        return self.run_read_query(*get_medialist_summary_query(json_request))
+
+    # Export the members of a medialist to a CSV or JSONL file, or an open stream, straight from
+    # the result cursor chunk_size records at a time. Paths ending in .gz are gzipped, and
+    # compress=True gzips into a binary stream. Returns the number of members written
+    def export_medialist(self, json_request, destination, fmt=None, compress=None, chunk_size=DEFAULT_BATCH_SIZE):
+        query, parameters, columns = export_medialist_query(json_request)
+        records = self.stream_query(query, parameters, fetch_size=chunk_size)
+        return write_records(
+            (record.data() for record in records), destination, fmt, columns, compress, chunk_size
+        )
+
+    # Backfill or repair the maintained member counts
+    def recount_medialist_members(self, uid=None):
+        result = self.run_write_transaction(*recount_medialist_members_query(uid))
+        if uid is not None:
+            invalidate_nodes("Medialist", uid)
+        else:
+            invalidate_label("Medialist")
+        return result
+
+class AsyncMedialist(AsyncNeo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        AsyncNeo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/medialists GET Fetch companies based on name and specified industries
+    async def find_medialists(self, json_request):
+        # Answer name searches from the in-memory index when it is enabled. It is only loaded
+        # outside a unit of work; until then the search runs in the database
+        index = get_name_index("Medialist") if json_request.get("name") else None
+        if index is not None and index.needs_load() and self._active_unit_of_work() is None:
+            index.load(await self.run_read_query(*index.load_query()))
+        if index is not None and index.loaded:
+            query, parameters = index.search_query("medialist", json_request)
+        else:
+            query, parameters = find_medialists_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return node_rows(records, "medialist", "Medialist") if json_request.get("rows") else records
+
+    # api/medialists POST Add a new media list to the database
+    async def add_medialist(self, json_request):
+        query, parameters = add_medialist_query(json_request)
+        result = await self.run_query(query, parameters)
+        on_success(result, lambda: update_name_index("Medialist", parameters["uid"], parameters))
+        invalidate_facets("Medialist")
+        return result
+
+    # Bulk import medialists from an iterable of JSON requests or a JSONL/CSV stream
+    async def add_medialists_bulk(self, source, batch_size=DEFAULT_BATCH_SIZE, fmt=None):
+        report = await async_bulk_create(
+            self, source, medialist_row,
+            lambda labels: bulk_create_query("medialist", "Medialist", labels),
+            batch_size, fmt,
+            on_created=lambda properties: update_name_index("Medialist", properties["uid"], properties)
+        )
+        if report["created"]:
+            invalidate_facets("Medialist")
+        return report
+
+    # api/medialists/{id} GET Fetch a medialist based on ID
+    async def find_medialist_by_uid(self, json_request):
+        # Serve from the read-through cache when it is enabled
         uid = json_request.get("uid")
+        hit, records, version = cached_node("Medialist", uid)
+        if hit:
+            return records
+        records = await self.run_read_query(*find_medialist_by_uid_query(json_request))
+        cache_node("Medialist", uid, records, version)
+        return records
+
+    # api/medialists/{id} PUT Update a journalist's personal details
+    async def update_medialist_industries(self, json_request):
+        result = await self.run_query(*update_medialist_industries_query(json_request))
+        invalidate_nodes("Medialist", json_request.get("uid"), *(json_request.get("uids") or []))
+        invalidate_facets("Medialist")
+        return result
+
+    async def add_medialist_industries(self, uid, new_industry_list):
+        result = await self.run_query(*add_medialist_industries_query(uid, new_industry_list))
+        invalidate_nodes("Medialist", uid)
+        invalidate_facets("Medialist")
+        return result
+
+    async def remove_medialist_industries(self, uid, industries_to_remove):
+        result = await self.run_query(*remove_medialist_industries_query(uid, industries_to_remove))
+        invalidate_nodes("Medialist", uid)
+        invalidate_facets("Medialist")
+        return result
 
-        # Construct query string
-        query = (
-            "MATCH (person)-[included:INCLUDED]->(medialist) "
-            "WHERE medialist.uid = $uid "
-            "RETURN included, person, medialist"
+    # api/medialists/{id}/details PUT Update a medialist’s properties
+    async def update_medialist_properties(self, json_request):
+        query, parameters = update_medialist_properties_query(json_request)
+        result = await self.run_query(query, parameters)
+        invalidate_nodes("Medialist", parameters["uid"])
+        on_success(result, lambda: update_name_index("Medialist", parameters["uid"], parameters["new_properties"]))
+        invalidate_facets("Medialist")
+        return result
+
+    # api/medialists/{id} POST Add a new person to the media list
+    async def add_to_medialist(self, json_request):
+        result = await self.run_query(*add_to_medialist_query(json_request))
+        invalidate_nodes("Medialist", json_request.get("medialist_uid"))
+        return result
+
+    # api/medialists/{id}/members POST Add many people to the media list, returning counts
+    async def add_many_to_medialist(self, json_request):
+        # Extract data from the JSON
+        medialist_uid = json_request.get("medialist_uid")
+        uids = list(dict.fromkeys(json_request.get("uids", [])))
+        new_properties = dict(json_request.get("relationship_properties") or {})
+        batch_size = json_request.get("batch_size", DEFAULT_BATCH_SIZE)
+        new_properties["creation_datetime"] = datetime.now()
+
+        counts = {"added": 0, "already_included": 0, "not_found": 0}
+        for batch in batched(uids, batch_size):
+            records = await self.run_write_transaction(*add_many_to_medialist_query(medialist_uid, batch, new_properties))
+            matched = records[0]["matched"] if records else 0
+            added = (records[0]["added"] or 0) if records else 0
+            counts["added"] += added
+            counts["already_included"] += max(0, matched - added)
+            counts["not_found"] += max(0, len(batch) - matched)
+        invalidate_nodes("Medialist", medialist_uid)
+        return counts
+
+    # api/medialists/{id}/members DELETE Remove many people from the media list, returning counts
+    async def remove_many_from_medialist(self, json_request):
+        # Extract data from the JSON
+        medialist_uid = json_request.get("medialist_uid")
+        uids = list(dict.fromkeys(json_request.get("uids", [])))
+        batch_size = json_request.get("batch_size", DEFAULT_BATCH_SIZE)
+
+        counts = {"removed": 0, "not_included": 0}
+        for batch in batched(uids, batch_size):
+            records = await self.run_write_transaction(*remove_many_from_medialist_query(medialist_uid, batch))
+            removed = records[0]["removed"] if records else 0
+            counts["removed"] += removed
+            counts["not_included"] += max(0, len(batch) - removed)
+        invalidate_nodes("Medialist", medialist_uid)
+        return counts
+
+    # api/medialists/{id}/all GET Get all people in a media list
+    async def get_all_in_medialist(self, json_request):
+        query, parameters = get_all_in_medialist_query(json_request)
+        records = await self.run_list_query(query, parameters, json_request)
+        return membership_rows(records) if json_request.get("rows") else records
+
+    # api/medialists/{id}/detail GET Get a media list and all its members as one record
+    async def get_medialist_detail(self, json_request):
+        return await self.run_read_query(*get_medialist_detail_query(json_request))
+
+    # api/medialists/{id}/summary GET Get a media list's details and member count without its members
+    async def get_medialist_summary(self, json_request):
+        return await self.run_read_query(*get_medialist_summary_query(json_request))
+
+    # Async counterpart of Medialist.export_medialist
+    async def export_medialist(self, json_request, destination, fmt=None, compress=None, chunk_size=DEFAULT_BATCH_SIZE):
+        query, parameters, columns = export_medialist_query(json_request)
+        records = self.stream_query(query, parameters, fetch_size=chunk_size)
+        return await async_write_records(
+            (record.data() async for record in records), destination, fmt, columns, compress, chunk_size
         )
-        parameters = {"uid": uid}
-        result = self.run_query(query, parameters)
+
+    # Backfill or repair the maintained member counts
+    async def recount_medialist_members(self, uid=None):
+        result = await self.run_write_transaction(*recount_medialist_members_query(uid))
+        if uid is not None:
+            invalidate_nodes("Medialist", uid)
+        else:
+            invalidate_label("Medialist")
         return result
\ No newline at end of file
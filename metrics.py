@@ -0,0 +1,294 @@
+# Query instrumentation for the entity classes.
+#
+# Disabled by default; enable_metrics() turns on per-method and per-query-template latency
+# histograms, record counts, server-side timings from the result summary and error counters.
+# While disabled, the connection layer only pays for one check of a module global per query.
+from dataclasses import dataclass
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    # Cumulative (upper bound, count) pairs, ending with +Inf
+    def cumulative(self):
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {_format_bound(bound): count for bound, count in self.cumulative()}
+        }
+
+# Statistics kept per entity method and per query template
+class QueryStats:
+    __slots__ = ("latency", "wait", "available_after", "consumed_after", "records", "errors", "retries")
+
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.wait = Histogram(buckets)
+        self.available_after = Histogram(buckets)
+        self.consumed_after = Histogram(buckets)
+        self.records = 0
+        self.errors = {}
+        self.retries = 0
+
+    def record(self, event):
+        self.latency.observe(event.duration)
+        self.retries += event.retries
+        if event.error is not None:
+            self.errors[event.error] = self.errors.get(event.error, 0) + 1
+            return
+        self.records += event.records
+        if event.wait is not None:
+            self.wait.observe(event.wait)
+        if event.available_after is not None:
+            self.available_after.observe(event.available_after)
+        if event.consumed_after is not None:
+            self.consumed_after.observe(event.consumed_after)
+
+    def to_dict(self):
+        return {
+            "latency_seconds": self.latency.to_dict(),
+            "wait_seconds": self.wait.to_dict(),
+            "result_available_after_seconds": self.available_after.to_dict(),
+            "result_consumed_after_seconds": self.consumed_after.to_dict(),
+            "records": self.records,
+            "retries": self.retries,
+            "errors": dict(self.errors)
+        }
+
+# One executed query, as passed to metrics hooks. Durations are in seconds; wait is the time
+# before the server started executing the query, i.e. pool acquisition plus network round trip,
+# and for managed transactions the failed attempts and backoff before the last one. retries
+# counts the attempts the driver repeated after transient errors
+@dataclass(slots=True)
+class QueryEvent:
+    method: str
+    template: str
+    query: str
+    duration: float
+    records: int = 0
+    wait: float = None
+    available_after: float = None
+    consumed_after: float = None
+    error: str = None
+    retries: int = 0
+
+# Stable short id of a query text; query texts are bounded, so this stays small
+@lru_cache(maxsize=4096)
+def template_id(query):
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+
+class QueryMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._methods = {}
+        self._templates = {}
+        self._queries = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    # Register a callback receiving a QueryEvent for every query
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def record(self, event):
+        with self._lock:
+            for stats, key in ((self._methods, event.method), (self._templates, event.template)):
+                entry = stats.get(key)
+                if entry is None:
+                    entry = stats[key] = QueryStats(self.buckets)
+                entry.record(event)
+            self._queries.setdefault(event.template, event.query)
+
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception:
+                logger.exception("Metrics hook failed")
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._templates.clear()
+            self._queries.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "methods": {method: stats.to_dict() for method, stats in self._methods.items()},
+                "templates": {
+                    template: dict(stats.to_dict(), query=self._queries[template])
+                    for template, stats in self._templates.items()
+                }
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    # Prometheus text exposition format
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for scope, stats in (("method", self._methods), ("template", self._templates)):
+                _histogram_lines(lines, f"neo4j_{scope}_duration_seconds", "Client-side query latency", scope, stats, "latency")
+                _histogram_lines(lines, f"neo4j_{scope}_wait_seconds", "Time before the server started the query, including pool wait", scope, stats, "wait")
+                _histogram_lines(lines, f"neo4j_{scope}_result_available_after_seconds", "Server time until the first record was available", scope, stats, "available_after")
+                _histogram_lines(lines, f"neo4j_{scope}_result_consumed_after_seconds", "Server time until the result was consumed", scope, stats, "consumed_after")
+
+                lines.append(f"# HELP neo4j_{scope}_records_total Records returned")
+                lines.append(f"# TYPE neo4j_{scope}_records_total counter")
+                for key, entry in stats.items():
+                    lines.append(f'neo4j_{scope}_records_total{{{scope}="{_escape(key)}"}} {entry.records}')
+
+                lines.append(f"# HELP neo4j_{scope}_retries_total Transaction attempts retried after transient errors")
+                lines.append(f"# TYPE neo4j_{scope}_retries_total counter")
+                for key, entry in stats.items():
+                    lines.append(f'neo4j_{scope}_retries_total{{{scope}="{_escape(key)}"}} {entry.retries}')
+
+                lines.append(f"# HELP neo4j_{scope}_errors_total Failed queries by exception type")
+                lines.append(f"# TYPE neo4j_{scope}_errors_total counter")
+                for key, entry in stats.items():
+                    for error, count in entry.errors.items():
+                        lines.append(f'neo4j_{scope}_errors_total{{{scope}="{_escape(key)}",error="{_escape(error)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _histogram_lines(lines, name, help_text, scope, stats, attribute):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, entry in stats.items():
+        histogram = getattr(entry, attribute)
+        label = f'{scope}="{_escape(key)}"'
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{label},le="{_format_bound(bound)}"}} {count}')
+        lines.append(f"{name}_sum{{{label}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{label}}} {histogram.count}")
+
+# Process-wide metrics registry; None until enabled
+_metrics = None
+
+def enable_metrics(hook=None, buckets=DEFAULT_BUCKETS):
+    global _metrics
+    metrics = QueryMetrics(buckets)
+    if hook is not None:
+        metrics.add_hook(hook)
+    _metrics = metrics
+    return metrics
+
+def disable_metrics():
+    global _metrics
+    _metrics = None
+
+def get_metrics():
+    return _metrics
+
+def metrics_text():
+    return _metrics.to_prometheus() if _metrics is not None else ""
+
+def metrics_json(**kwargs):
+    return _metrics.to_json(**kwargs) if _metrics is not None else json.dumps(None)
+
+# Name of the entity method running the query, e.g. "Journalist.find_journalists": the
+# innermost caller bound to a connection (it has a _driver) outside the connection module
+def calling_method():
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get("__name__") != "media.connection":
+            instance = frame.f_locals.get("self")
+            if instance is not None and hasattr(instance, "_driver"):
+                return f"{type(instance).__name__}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+# Timing of one query in progress
+class Observation:
+    __slots__ = ("metrics", "method", "query", "start", "first", "attempts")
+
+    def __init__(self, metrics, method, query):
+        self.metrics = metrics
+        self.method = method
+        self.query = query
+        self.start = time.perf_counter()
+        self.first = None
+        self.attempts = 0
+
+    # A managed transaction function is starting, again when the driver retries it
+    def attempt(self):
+        self.attempts += 1
+
+    @property
+    def retries(self):
+        return max(0, self.attempts - 1)
+
+    # The server has acknowledged the query and the result can be read
+    def started(self):
+        self.first = time.perf_counter()
+
+    def finish(self, summary, records):
+        duration = time.perf_counter() - self.start
+        available_after = _seconds(getattr(summary, "result_available_after", None))
+        consumed_after = _seconds(getattr(summary, "result_consumed_after", None))
+        wait = None
+        if self.first is not None:
+            wait = max(0.0, self.first - self.start - (available_after or 0.0))
+        self.metrics.record(QueryEvent(
+            self.method, template_id(self.query), self.query, duration, records,
+            wait, available_after, consumed_after, retries=self.retries
+        ))
+
+    def fail(self, error):
+        duration = time.perf_counter() - self.start
+        self.metrics.record(QueryEvent(
+            self.method, template_id(self.query), self.query, duration,
+            error=type(error).__name__, retries=self.retries
+        ))
+
+def _seconds(milliseconds):
+    return milliseconds / 1000.0 if milliseconds is not None else None
+
+# Start timing a query, or return None when metrics are disabled
+def start_observation(query, method=None):
+    metrics = _metrics
+    if metrics is None:
+        return None
+    return Observation(metrics, method or calling_method(), query)
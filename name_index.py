@@ -0,0 +1,282 @@
+from media.pagination import is_paginated, keyset_filter, keyset_order, keyset_parameters
+from media.query_builder import canonical_labels, industry_filter
+from media.rows import return_item
+from collections import Counter
+import threading
+import time
+
+# Seconds after which a loaded index is reloaded from the graph on the next search, so names
+# written by other processes show up. None keeps the first load for the life of the process,
+# which is only correct when this process is the single writer of the names
+NAME_INDEX_TTL = 300.0
+
+# Name properties indexed per label, and whether the reversed name is matched as well.
+# Mirrors the predicates used by the database-side fuzzy search.
+NAME_FIELDS = {
+    "Journalist": (("first_name", "last_name"), False),
+    "Company": (("company_name",), True),
+    "Medialist": (("medialist_name",), True),
+}
+
+# Levenshtein distance, matching apoc.text.distance
+def levenshtein(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return previous[-1]
+
+# Padded trigrams of a value, with multiplicity
+def trigrams(value):
+    padded = f"##{value}##"
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+# Burkhard-Keller tree over lower-cased name values
+class BKTree:
+    def __init__(self):
+        self._root = None
+
+    def add(self, word):
+        if self._root is None:
+            self._root = (word, {})
+            return
+        node_word, children = self._root
+        while True:
+            distance = levenshtein(word, node_word)
+            if distance == 0:
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (word, {})
+                return
+            node_word, children = child
+
+    # Return (word, distance) for every word within max_distance of the query
+    def search(self, word, max_distance):
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_word, children = stack.pop()
+            distance = levenshtein(word, node_word)
+            if distance <= max_distance:
+                matches.append((node_word, distance))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return matches
+
+# In-memory fuzzy name index for one label, loaded lazily from the graph.
+# Combines a trigram inverted index with a BK-tree for queries too short to filter by trigrams.
+#
+# Writes made through this process update the index after they commit. Writes from other
+# processes are only picked up by the reload that follows once ttl seconds have passed.
+# Updates that commit while a load is running are buffered and replayed on top of the loaded
+# records, since the load query may have read the graph before they committed.
+class NameIndex:
+    def __init__(self, label, ttl=NAME_INDEX_TTL):
+        self.label = label
+        self.fields, self.match_reversed = NAME_FIELDS[label]
+        self.ttl = ttl
+        self.loaded = False
+        self._loaded_at = None
+        self._loading = 0
+        self._pending = []
+        self._reset()
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self._tree = BKTree()
+        self._postings = {}
+        self._uids_by_value = {}
+        self._values_by_uid = {}
+
+    # Whether the next search should (re)load the index first
+    def needs_load(self):
+        if not self.loaded:
+            return True
+        return self.ttl is not None and time.monotonic() - self._loaded_at >= self.ttl
+
+    # Query that fetches every indexed name. Building it starts buffering updates until the
+    # matching load call
+    def load_query(self):
+        with self._lock:
+            self._loading += 1
+        variable = "n"
+        columns = ", ".join(f"{variable}.{field} AS {field}" for field in self.fields)
+        query = f"MATCH ({variable}:{self.label}) RETURN {variable}.uid AS uid, {columns}"
+        return query, None
+
+    # Rebuild the index from the load_query records, then replay the updates buffered since the
+    # load started. A failed query (None) keeps the current state, so the next search tries again
+    def load(self, records):
+        with self._lock:
+            self._loading = max(0, self._loading - 1)
+            pending = self._pending
+            if self._loading == 0:
+                self._pending = []
+            if records is None:
+                return
+
+            self._reset()
+            for record in records:
+                self._set(record["uid"], [record[field] for field in self.fields])
+            for uid, properties in pending:
+                self._apply(uid, properties)
+            self.loaded = True
+            self._loaded_at = time.monotonic()
+
+    # Add or replace the indexed names of a node; fields missing from properties are kept.
+    # Before the first load there is nothing to update unless a load is in progress
+    def update(self, uid, properties):
+        if uid is None or not any(field in properties for field in self.fields):
+            return
+        with self._lock:
+            if self._loading:
+                self._pending.append((uid, dict(properties)))
+            if self.loaded:
+                self._apply(uid, properties)
+
+    def _apply(self, uid, properties):
+        current = dict(zip(self.fields, self._values_by_uid.get(uid, (None,) * len(self.fields))))
+        for field in self.fields:
+            if field in properties:
+                current[field] = properties[field]
+        self._set(uid, [current[field] for field in self.fields])
+
+    def _set(self, uid, values):
+        for value in self._values_by_uid.pop(uid, ()):
+            if value is not None:
+                self._uids_by_value.get(value, set()).discard(uid)
+
+        values = tuple(value.lower() if isinstance(value, str) else None for value in values)
+        self._values_by_uid[uid] = values
+        for value in values:
+            if value is None:
+                continue
+            if value not in self._uids_by_value:
+                self._uids_by_value[value] = set()
+                self._tree.add(value)
+                for gram, count in trigrams(value).items():
+                    self._postings.setdefault(gram, {})[value] = count
+            self._uids_by_value[value].add(uid)
+
+    # Return (value, distance) for every indexed value within max_distance of the query.
+    # Values within k edits share at least len + 2 - 3k padded trigrams with the query, so when
+    # that bound is positive only values found through the trigram postings are compared;
+    # otherwise the BK-tree is searched.
+    def _matching_values(self, query, max_distance):
+        query_grams = trigrams(query)
+        required = len(query) + 2 - 3 * max_distance
+        if required <= 0:
+            return self._tree.search(query, max_distance)
+
+        shared = Counter()
+        for gram, query_count in query_grams.items():
+            for value, count in self._postings.get(gram, {}).items():
+                shared[value] += min(query_count, count)
+
+        matches = []
+        for value, count in shared.items():
+            if count < required or abs(len(value) - len(query)) > max_distance:
+                continue
+            distance = levenshtein(query, value)
+            if distance <= max_distance:
+                matches.append((value, distance))
+        return matches
+
+    # Return [(uid, distance)] within max_distance, closest first
+    def search(self, name, max_distance):
+        queries = [name.lower()]
+        if self.match_reversed:
+            queries.append(" ".join(reversed(name.split())).lower())
+
+        best = {}
+        with self._lock:
+            for query in queries:
+                for value, distance in self._matching_values(query, max_distance):
+                    for uid in self._uids_by_value.get(value, ()):
+                        if uid not in best or distance < best[uid]:
+                            best[uid] = distance
+        return sorted(best.items(), key=lambda item: (item[1], item[0]))
+
+    # Build the query that hydrates the local matches for a find_* JSON request
+    def search_query(self, variable, json_request):
+        matches = self.search(json_request.get("name"), json_request.get("max_distance") or 0)
+        return hydrate_matches_query(variable, self.label, matches, json_request, json_request.get("industry_list"))
+
+# Process-wide name indexes, one per label, used only once enabled
+_indexes = {}
+_enabled = False
+_ttl = NAME_INDEX_TTL
+_indexes_lock = threading.Lock()
+
+# Enable the in-memory index. Pass ttl=None only when this process is the single writer
+def enable_name_index(ttl=NAME_INDEX_TTL):
+    global _enabled, _ttl
+    _ttl = ttl
+    _enabled = True
+
+# Disable the in-memory index and drop anything loaded
+def disable_name_index():
+    global _enabled
+    _enabled = False
+    with _indexes_lock:
+        _indexes.clear()
+
+# Return the index for a label, or None when the in-memory index is disabled
+def get_name_index(label):
+    if not _enabled:
+        return None
+    index = _indexes.get(label)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(label, NameIndex(label, _ttl))
+    return index
+
+# Keep a loaded index current after a node's names were written to the graph
+def update_name_index(label, uid, properties):
+    index = get_name_index(label)
+    if index is not None:
+        index.update(uid, properties)
+
+# Fetch the nodes matched by the in-memory index, keeping its ranking
+def hydrate_matches_query(variable, label, matches, json_request, industry_list=None):
+    top_k = json_request.get("top_k")
+
+    query = (
+        "UNWIND $matches AS hit "
+        f"MATCH ({variable}:{label}) WHERE {variable}.uid = hit.uid "
+    )
+
+    # If the industries are specified, only keep matches with those labels
+    if industry_list:
+        query += f"WITH {variable}, hit " + industry_filter(variable)
+
+    if is_paginated(json_request):
+        query += keyset_filter(variable, json_request)
+        query += "RETURN " + return_item(variable, label, json_request)
+        query += keyset_order(variable, json_request)
+    else:
+        query += (
+            f"WITH {variable}, hit ORDER BY hit.rank "
+            + ("LIMIT $top_k " if top_k is not None else "")
+            + "RETURN " + return_item(variable, label, json_request)
+        )
+
+    parameters = {
+        "matches": [{"uid": uid, "rank": rank} for rank, (uid, _) in enumerate(matches)],
+        "top_k": top_k,
+        "industry_list": list(canonical_labels(industry_list))
+    }
+    parameters.update(keyset_parameters(json_request))
+    return query, parameters
@@ -0,0 +1,49 @@
+# Keyset pagination helpers shared by the list query builders.
+# Pages are ordered by the uid of a node in the query; callers pass the last uid they
+# received as "after" and the page size as "limit" in the JSON request.
+#
+# In relationship listings the same node can appear on several rows (e.g. many employment
+# records at one company), so pages are ordered by the uid and the element id of the
+# relationship, and "after" is {"uid": ..., "id": ...} taken from the last row, where id is
+# the "<relationship>_id" column. A bare uid there resumes after every row of that node.
+
+def is_paginated(json_request):
+    return json_request.get("after") is not None or json_request.get("limit") is not None
+
+def _compound(json_request, relationship):
+    return relationship is not None and isinstance(json_request.get("after"), dict)
+
+# Filter to rows after the cursor, inserted just before the RETURN clause
+def keyset_filter(variable, json_request, relationship=None):
+    if json_request.get("after") is None:
+        return ""
+    if _compound(json_request, relationship):
+        return (
+            f"WITH * WHERE {variable}.uid > $after_uid "
+            f"OR ({variable}.uid = $after_uid AND elementId({relationship}) > $after_id) "
+        )
+    return f"WITH * WHERE {variable}.uid > $after "
+
+# Order by the cursor key and cap the page size, appended after the RETURN clause.
+# Relationship listings also order by their "<relationship>_id" column
+def keyset_order(variable, json_request, relationship=None):
+    if not is_paginated(json_request):
+        return ""
+    clause = f" ORDER BY {variable}.uid"
+    if relationship is not None:
+        clause += f", {relationship}_id"
+    if json_request.get("limit") is not None:
+        clause += " LIMIT $limit"
+    return clause
+
+def keyset_parameters(json_request):
+    after = json_request.get("after")
+    parameters = {
+        "after": after,
+        "limit": json_request.get("limit")
+    }
+    if isinstance(after, dict):
+        parameters["after"] = None
+        parameters["after_uid"] = after.get("uid")
+        parameters["after_id"] = after.get("id")
+    return parameters
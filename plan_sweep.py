@@ -0,0 +1,341 @@
+# Profile every query template of the entity modules against a fixture dataset and compare
+# the db hits with a stored baseline.
+#
+#   python -m media.plan_sweep <uri> <username> <password> [--baseline FILE] [--update-baseline]
+#       [--allow-missing]
+#
+# The fixture nodes are merged on fixed uids, so the sweep can run repeatedly against a test
+# database. Every template runs under PROFILE inside a unit of work that is rolled back, so
+# writes leave no trace. The command exits with 1 when a template exceeds its baseline, has
+# no baseline or could not be profiled; --allow-missing only warns about missing baselines.
+from media import company, journalist, media, medialist, search
+from media.connection import Neo4jConnection
+from media.schema import ensure_schema
+import argparse
+import json
+import os
+import sys
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_baseline.json")
+
+FIXTURE_JOURNALISTS = 50
+FIXTURE_COMPANIES = 10
+FIXTURE_MEDIALISTS = 3
+FIXTURE_MEDIA = 5
+
+def fixture_uid(kind, number):
+    return f"fixture-{kind}-{number}"
+
+FIXTURE_STATEMENTS = [
+    (
+        "UNWIND $rows AS row "
+        "MERGE (journalist:Journalist {uid: row.uid}) "
+        "SET journalist.first_name = row.first_name, journalist.last_name = 'Fixture', "
+        "    journalist.birthdate = date('1990-01-01'), journalist.email = row.uid + '@example.com' "
+        "SET journalist:Technology",
+        lambda journalists: {"rows": [
+            {"uid": fixture_uid("journalist", i), "first_name": f"Writer{i}"}
+            for i in range(journalists)
+        ]}
+    ),
+    (
+        "UNWIND $rows AS row "
+        "MERGE (company:Company {uid: row.uid}) "
+        "SET company.company_name = row.company_name, company.founded_date = date('2000-01-01') "
+        "SET company:Technology",
+        lambda journalists: {"rows": [
+            {"uid": fixture_uid("company", i), "company_name": f"Fixture Company {i}"}
+            for i in range(FIXTURE_COMPANIES)
+        ]}
+    ),
+    (
+        "UNWIND $rows AS row "
+        "MERGE (medialist:Medialist {uid: row.uid}) "
+        "SET medialist.medialist_name = row.medialist_name, medialist.creation_datetime = date() "
+        "SET medialist:Technology",
+        lambda journalists: {"rows": [
+            {"uid": fixture_uid("medialist", i), "medialist_name": f"Fixture List {i}"}
+            for i in range(FIXTURE_MEDIALISTS)
+        ]}
+    ),
+    (
+        "UNWIND $rows AS row "
+        "MATCH (journalist:Journalist {uid: row.journalist}), (company:Company {uid: row.company}) "
+        "MERGE (journalist)-[employment:EMPLOYMENT]->(company) "
+        "SET employment.role = 'Reporter', employment.start_date = date('2020-01-01') "
+        "MERGE (journalist)-[current:CURRENT_EMPLOYER]->(company) "
+        "SET current.since = date('2020-01-01')",
+        lambda journalists: {"rows": [
+            {"journalist": fixture_uid("journalist", i), "company": fixture_uid("company", i % FIXTURE_COMPANIES)}
+            for i in range(journalists)
+        ]}
+    ),
+    (
+        "UNWIND $rows AS row "
+        "MATCH (journalist:Journalist {uid: row.journalist}), (medialist:Medialist {uid: row.medialist}) "
+        "MERGE (journalist)-[included:INCLUDED]->(medialist) "
+        "SET included.creation_datetime = date('2024-01-01')",
+        lambda journalists: {"rows": [
+            {"journalist": fixture_uid("journalist", i), "medialist": fixture_uid("medialist", i % FIXTURE_MEDIALISTS)}
+            for i in range(journalists)
+        ]}
+    ),
+    (
+        "MATCH (medialist:Medialist) WHERE medialist.uid STARTS WITH 'fixture-' "
+        "SET medialist.member_count = COUNT { (medialist)<-[:INCLUDED]-() }",
+        lambda journalists: {}
+    ),
+    (
+        "UNWIND $rows AS row "
+        "MATCH (author:Journalist {uid: $author}), (journalist:Journalist {uid: row.journalist}) "
+        "MERGE (author)-[note:NOTE]->(journalist) "
+        "SET note.creation_date = date('2024-01-01'), note.content = 'Fixture note'",
+        lambda journalists: {"author": fixture_uid("journalist", 0), "rows": [
+            {"journalist": fixture_uid("journalist", i)} for i in range(1, journalists)
+        ]}
+    ),
+    (
+        "UNWIND $rows AS row "
+        "MERGE (media:media {first_name: 'Fixture', last_name: row.last_name})",
+        lambda journalists: {"rows": [{"last_name": f"Outlet{i}"} for i in range(FIXTURE_MEDIA)]}
+    ),
+]
+
+# Create or refresh the fixture dataset and wait for the indexes to catch up
+def load_fixtures(connection, journalists=FIXTURE_JOURNALISTS):
+    for query, parameters in FIXTURE_STATEMENTS:
+        connection.run_write_transaction(query, parameters(journalists))
+    connection.run_query("CALL db.awaitIndexes(300)")
+
+# Identifiers of fixture nodes used as arguments by the sweep cases
+def fixture_context(connection):
+    media_ids = connection.run_query(
+        "MATCH (media:media {first_name: 'Fixture'}) RETURN ID(media) AS id ORDER BY id LIMIT 1"
+    )
+    company_ids = connection.run_query(
+        "MATCH (company:Company {uid: $uid}) RETURN ID(company) AS id", {"uid": fixture_uid("company", 0)}
+    )
+    return {
+        "journalist": fixture_uid("journalist", 1),
+        "author": fixture_uid("journalist", 0),
+        "company": fixture_uid("company", 0),
+        "medialist": fixture_uid("medialist", 0),
+        "members": [fixture_uid("journalist", i) for i in range(0, FIXTURE_JOURNALISTS, 5)],
+        "media_id": media_ids[0]["id"] if media_ids else None,
+        "company_id": company_ids[0]["id"] if company_ids else None
+    }
+
+# Every query template of the entity modules, as (name, builder taking the fixture context)
+SWEEP_CASES = [
+    # journalist.py
+    ("journalist.find_journalists", lambda f: journalist.find_journalists_query({})),
+    ("journalist.find_journalists.industries", lambda f: journalist.find_journalists_query({"industry_list": ["Technology"]})),
+    ("journalist.find_journalists.name", lambda f: journalist.find_journalists_query({"name": "Writer1", "max_distance": 1})),
+    ("journalist.find_journalists.page", lambda f: journalist.find_journalists_query({"after": f["journalist"], "limit": 10})),
+    ("journalist.add_journalist", lambda f: journalist.add_journalist_query({
+        "first_name": "Sweep", "last_name": "Fixture", "birthdate": "1990-01-01", "industries": ["Technology"]
+    })),
+    ("journalist.find_journalist_by_uid", lambda f: journalist.find_journalist_by_uid_query({"uid": f["journalist"]})),
+    ("journalist.update_journalist_industries", lambda f: journalist.update_journalist_industries_query({
+        "uid": f["journalist"], "industries_to_remove": ["Technology"], "new_industry_list": ["Politics"]
+    })),
+    ("journalist.update_journalist_properties", lambda f: journalist.update_journalist_properties_query({
+        "uid": f["journalist"], "new_properties": {"description": "Sweep"}
+    })),
+    ("journalist.add_employment_record", lambda f: journalist.add_employment_record_query({
+        "uid": f["journalist"], "company_uid": f["company"],
+        "relationship_properties": {"role": "Editor", "start_date": "2024-01-01"}
+    })),
+    ("journalist.get_all_employment_records", lambda f: journalist.get_all_employment_records_query({"uid": f["journalist"]})),
+    ("journalist.get_all_employment_records.current", lambda f: journalist.get_all_employment_records_query({
+        "uid": f["journalist"], "current_only": True
+    })),
+    ("journalist.get_all_employment_records.page", lambda f: journalist.get_all_employment_records_query({
+        "uid": f["journalist"], "after": {"uid": f["company"], "id": ""}, "limit": 10
+    })),
+    ("journalist.refresh_current_employers", lambda f: journalist.refresh_current_employers_query(f["journalist"])),
+    ("journalist.refresh_current_employers.all", lambda f: journalist.refresh_current_employers_query()),
+    ("journalist.get_all_notes", lambda f: journalist.get_all_notes_query({"uid": f["journalist"]})),
+    ("journalist.get_all_notes.page", lambda f: journalist.get_all_notes_query({
+        "uid": f["journalist"], "limit": 20, "author_summary": True
+    })),
+    ("journalist.create_new_note_for_journalist", lambda f: journalist.create_new_note_for_journalist_query({
+        "uid": f["journalist"], "author_uid": f["author"], "author_label": "Journalist", "content": "Sweep"
+    })),
+    ("journalist.add_notes_bulk", lambda f: (journalist.bulk_create_notes_query("Journalist"), {"rows": [
+        dict(journalist.note_row({"uid": f["journalist"], "author_uid": f["author"], "content": "Sweep"}), index=i)
+        for i in range(10)
+    ]})),
+    ("journalist.add_notes_bulk.default_labels", lambda f: (journalist.bulk_create_notes_query(), {"rows": [
+        dict(journalist.note_row({"uid": f["journalist"], "author_uid": f["author"], "content": "Sweep"}), index=i)
+        for i in range(10)
+    ]})),
+    ("journalist.node_has_label", lambda f: journalist.node_has_label_query({"uid": f["journalist"], "label": "Journalist"})),
+
+    # company.py
+    ("company.find_company_by_uid", lambda f: company.find_company_by_uid_query({"uid": f["company"]})),
+    ("company.find_companies", lambda f: company.find_companies_query({})),
+    ("company.find_companies.industries", lambda f: company.find_companies_query({"industry_list": ["Technology"]})),
+    ("company.find_companies.name", lambda f: company.find_companies_query({"name": "Fixture Company 1", "max_distance": 1})),
+    ("company.add_company", lambda f: company.add_company_query({
+        "company_name": "Sweep Company", "founded_date": "2000-01-01", "industries": ["Technology"]
+    })),
+    ("company.update_company_properties", lambda f: company.update_company_properties_query(f["company"], {"description": "Sweep"})),
+    ("company.update_company_industries", lambda f: company.update_company_industries_query({
+        "uid": f["company"], "industries_to_remove": ["Technology"], "new_industry_list": ["Politics"]
+    })),
+    ("company.get_all_employment_records", lambda f: company.get_all_employment_records_query({"uid": f["company"]})),
+    ("company.get_all_employment_records.period", lambda f: company.get_all_employment_records_query({
+        "uid": f["company"], "from_date": "2021-01-01", "to_date": "2021-12-31"
+    })),
+    ("company.get_current_staff", lambda f: company.get_current_staff_query({"uid": f["company"]})),
+
+    # medialist.py
+    ("medialist.find_medialists", lambda f: medialist.find_medialists_query({})),
+    ("medialist.find_medialists.name", lambda f: medialist.find_medialists_query({"name": "Fixture List 1", "max_distance": 1})),
+    ("medialist.add_medialist", lambda f: medialist.add_medialist_query({"medialist_name": "Sweep List", "industries": ["Technology"]})),
+    ("medialist.find_medialist_by_uid", lambda f: medialist.find_medialist_by_uid_query({"uid": f["medialist"]})),
+    ("medialist.update_medialist_industries", lambda f: medialist.update_medialist_industries_query({
+        "uid": f["medialist"], "industries_to_remove": ["Technology"], "new_industry_list": ["Politics"]
+    })),
+    ("medialist.update_medialist_properties", lambda f: medialist.update_medialist_properties_query({
+        "uid": f["medialist"], "new_properties": {"description": "Sweep"}
+    })),
+    ("medialist.add_to_medialist", lambda f: medialist.add_to_medialist_query({
+        "uid": f["journalist"], "medialist_uid": f["medialist"], "relationship_properties": {}
+    })),
+    ("medialist.add_many_to_medialist", lambda f: medialist.add_many_to_medialist_query(f["medialist"], f["members"], {})),
+    ("medialist.remove_many_from_medialist", lambda f: medialist.remove_many_from_medialist_query(f["medialist"], f["members"])),
+    ("medialist.get_all_in_medialist", lambda f: medialist.get_all_in_medialist_query({"uid": f["medialist"]})),
+    ("medialist.get_medialist_detail", lambda f: medialist.get_medialist_detail_query({
+        "uid": f["medialist"], "include_employer": True, "include_industries": True
+    })),
+    ("medialist.get_medialist_summary", lambda f: medialist.get_medialist_summary_query({"uid": f["medialist"]})),
+    ("medialist.export_medialist", lambda f: medialist.export_medialist_query({"uid": f["medialist"], "include_employer": True})[:2]),
+
+    # media.py
+    ("media.find_all_media", lambda f: media.find_all_media_query()),
+    ("media.add_media", lambda f: media.add_media_query("Sweep", "Fixture", "1990-01-01", "Sweep", None, None, ["Technology"])),
+    ("media.fuzzy_search_media_by_name", lambda f: media.fuzzy_search_media_by_name_query("Fixture", 1)),
+    ("media.update_media_properties", lambda f: media.update_media_properties_query(f["media_id"], {"description": "Sweep"})),
+    ("media.add_media_industries", lambda f: media.add_media_industries_query(f["media_id"], ["Technology"])),
+    ("media.remove_media_industries", lambda f: media.remove_media_industries_query(f["media_id"], ["Technology"])),
+    ("media.add_employment_record_for_media", lambda f: media.add_employment_record_for_media_query(f["media_id"], f["company_id"], {})),
+    ("media.get_all_employment_records", lambda f: media.get_all_employment_records_query(f["media_id"])),
+    ("media.get_all_notes", lambda f: media.get_all_notes_query(f["media_id"])),
+    ("media.create_new_note_for_media", lambda f: media.create_new_note_for_media_query(f["media_id"], {"content": "Sweep"})),
+    ("media.node_has_label", lambda f: media.node_has_label_query(f["media_id"], "media")),
+
+    # search.py
+    ("search.search_all", lambda f: search.search_all_query({
+        "name": "Fixture", "max_distance": 1, "top_k": 20, "per_type_limit": 10
+    })),
+    ("search.industry_facets", lambda f: search.industry_facets_query({})),
+    ("search.industry_facets.name", lambda f: search.industry_facets_query({"name": "Fixture", "max_distance": 1})),
+]
+
+class _Rollback(Exception):
+    pass
+
+# Profile one query in a transaction that is always rolled back
+def profile_query(connection, query, parameters):
+    with connection.capture_plans("PROFILE") as capture:
+        try:
+            with connection.unit_of_work():
+                connection.run_query(query, parameters)
+                raise _Rollback()
+        except _Rollback:
+            pass
+    return capture.plans[0] if capture.plans else None
+
+# Profile every sweep case, returning ({name: CapturedPlan}, {name: error}). A case that raises,
+# e.g. on a missing fixture or a schema error, gets no plan and its error is recorded, so the
+# other cases are still profiled
+def sweep(connection, cases=SWEEP_CASES):
+    context = fixture_context(connection)
+    plans = {}
+    errors = {}
+    for name, build in cases:
+        try:
+            plans[name] = profile_query(connection, *build(context))
+        except Exception as e:
+            plans[name] = None
+            errors[name] = f"{type(e).__name__}: {e}"
+    return plans, errors
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+# Write the db hits of the profiled templates, keeping the previous entries of templates that
+# failed this time
+def save_baseline(path, plans, previous=None):
+    baseline = {name: hits for name, hits in (previous or {}).items() if name in plans and plans[name] is None}
+    baseline.update({name: plan.db_hits for name, plan in plans.items() if plan is not None})
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+# Names of the templates whose db hits exceed the baseline by more than the tolerance
+def regressions(plans, baseline, tolerance=0.0):
+    exceeded = []
+    for name, plan in plans.items():
+        limit = baseline.get(name)
+        if plan is None or limit is None:
+            continue
+        if plan.db_hits > limit * (1 + tolerance):
+            exceeded.append(name)
+    return exceeded
+
+# Names of the profiled templates the baseline has no entry for
+def missing_baselines(plans, baseline):
+    return [name for name, plan in plans.items() if plan is not None and name not in baseline]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m media.plan_sweep")
+    parser.add_argument("uri")
+    parser.add_argument("username")
+    parser.add_argument("password")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="allowed relative increase in db hits")
+    parser.add_argument("--plans", action="store_true", help="print the operator tree of every template")
+    parser.add_argument("--allow-missing", action="store_true", help="only warn about templates without a baseline")
+    args = parser.parse_args(argv)
+
+    connection = Neo4jConnection(args.uri, args.username, args.password)
+    ensure_schema(connection)
+    load_fixtures(connection)
+    plans, errors = sweep(connection)
+    baseline = load_baseline(args.baseline)
+
+    for name, plan in plans.items():
+        if plan is None:
+            print(f"{name}: " + (f"failed ({errors[name]})" if name in errors else "no plan"))
+            continue
+        scans = ", ".join(operator.operator for operator in plan.scans())
+        print(f"{name}: {plan.db_hits} db hits (baseline {baseline.get(name, '-')})" + (f" scans: {scans}" if scans else ""))
+        if args.plans:
+            print(plan.format())
+
+    failed = [name for name, plan in plans.items() if plan is None]
+    for name in failed:
+        print(f"Failure: {name} was not profiled" + (f": {errors[name]}" if name in errors else ", the query returned no plan"))
+
+    if args.update_baseline:
+        save_baseline(args.baseline, plans, baseline)
+        print("Baseline written to", args.baseline)
+        return 1 if failed else 0
+
+    exceeded = regressions(plans, baseline, args.tolerance)
+    for name in exceeded:
+        print(f"Regression: {name} uses {plans[name].db_hits} db hits, baseline {baseline[name]}")
+    missing = missing_baselines(plans, baseline)
+    for name in missing:
+        print(f"{'Warning' if args.allow_missing else 'Failure'}: {name} has no baseline, run with --update-baseline")
+    return 1 if exceeded or failed or (missing and not args.allow_missing) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
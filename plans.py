@@ -0,0 +1,150 @@
+# EXPLAIN/PROFILE capture for the entity classes.
+#
+# Inside connection.capture_plans(mode) every query an entity method sends is prefixed with
+# EXPLAIN or PROFILE and the plan from its result summary is recorded with the operator tree,
+# and for PROFILE the db hits and rows of every operator. PROFILE executes the query, so
+# capture writes inside a unit of work that is rolled back; EXPLAIN only plans it.
+from media.metrics import calling_method
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+PLAN_MODES = ("EXPLAIN", "PROFILE")
+
+# Operators that read every node, or every node with a label, instead of seeking an index
+SCAN_OPERATORS = ("AllNodesScan", "NodeByLabelScan")
+
+@dataclass(slots=True)
+class Operator:
+    operator: str
+    details: str = None
+    identifiers: tuple = ()
+    estimated_rows: float = None
+    db_hits: int = None
+    rows: int = None
+    children: list = field(default_factory=list)
+
+    # This operator and all of its descendants, depth first
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self):
+        return {
+            "operator": self.operator,
+            "details": self.details,
+            "identifiers": list(self.identifiers),
+            "estimated_rows": self.estimated_rows,
+            "db_hits": self.db_hits,
+            "rows": self.rows,
+            "children": [child.to_dict() for child in self.children]
+        }
+
+# Build the operator tree from a summary plan or profile
+def parse_operator(plan):
+    args = plan.get("args", {})
+    return Operator(
+        operator=plan.get("operatorType", "").split("@")[0],
+        details=args.get("Details"),
+        identifiers=tuple(plan.get("identifiers", ())),
+        estimated_rows=args.get("EstimatedRows"),
+        db_hits=plan.get("dbHits"),
+        rows=plan.get("rows"),
+        children=[parse_operator(child) for child in plan.get("children", ())]
+    )
+
+@dataclass(slots=True)
+class CapturedPlan:
+    method: str
+    query: str
+    parameters: dict
+    mode: str
+    root: Operator
+
+    # Total db hits of the query; None under EXPLAIN
+    @property
+    def db_hits(self):
+        if self.mode != "PROFILE":
+            return None
+        return sum(operator.db_hits or 0 for operator in self.root.walk())
+
+    # Operators that scan nodes instead of seeking them through an index
+    def scans(self):
+        return [operator for operator in self.root.walk() if operator.operator in SCAN_OPERATORS]
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "query": self.query,
+            "mode": self.mode,
+            "db_hits": self.db_hits,
+            "scans": [operator.operator for operator in self.scans()],
+            "plan": self.root.to_dict()
+        }
+
+    # Indented operator tree, one operator per line
+    def format(self):
+        lines = []
+
+        def add(operator, depth):
+            line = "  " * depth + operator.operator
+            if operator.db_hits is not None:
+                line += f" (db hits: {operator.db_hits}, rows: {operator.rows})"
+            if operator.details:
+                line += f" {operator.details}"
+            lines.append(line)
+            for child in operator.children:
+                add(child, depth + 1)
+
+        add(self.root, 0)
+        return "\n".join(lines)
+
+# Plans recorded while a capture is active
+class PlanCapture:
+    def __init__(self, mode="PROFILE"):
+        mode = mode.upper()
+        if mode not in PLAN_MODES:
+            raise ValueError("Plan mode must be EXPLAIN or PROFILE")
+        self.mode = mode
+        self.plans = []
+
+    def record(self, method, query, parameters, summary):
+        plan = summary.profile if self.mode == "PROFILE" else summary.plan
+        if plan is None:
+            return
+        self.plans.append(CapturedPlan(method, query, parameters, self.mode, parse_operator(plan)))
+
+    # Run a query on a session or transaction under the capture mode and list its records
+    def run(self, runner, query, parameters=None, method=None):
+        method = method or calling_method()
+        result = runner.run(f"{self.mode} {query}", parameters)
+        records = list(result)
+        self.record(method, query, parameters, result.consume())
+        return records
+
+    async def run_async(self, runner, query, parameters=None, method=None):
+        method = method or calling_method()
+        result = await runner.run(f"{self.mode} {query}", parameters)
+        records = [record async for record in result]
+        self.record(method, query, parameters, await result.consume())
+        return records
+
+    @property
+    def db_hits(self):
+        return sum(plan.db_hits or 0 for plan in self.plans)
+
+# Capture open in the current thread or task, if any
+_current_capture = ContextVar("current_plan_capture", default=None)
+
+def current_capture():
+    return _current_capture.get()
+
+@contextmanager
+def capture_plans(mode="PROFILE"):
+    capture = PlanCapture(mode)
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _current_capture.reset(token)
@@ -0,0 +1,67 @@
+# Helpers for building Cypher that involves industry labels.
+#
+# Label sets are canonicalised (validated, de-duplicated and sorted) before they reach a
+# query string, and the generated strings are memoised, so the number of distinct query
+# texts the server has to plan stays bounded. Label filters are passed as parameters where
+# Cypher allows it, so they do not change the query text at all.
+from functools import lru_cache
+
+# Validate, de-duplicate and sort a list of industry labels
+def canonical_labels(labels):
+    for label in labels or []:
+        if not isinstance(label, str) or not label:
+            raise ValueError("Invalid industry name")
+    return tuple(sorted(set(labels or [])))
+
+# Quote a label so any industry name is spliced into Cypher safely
+def escape_label(label):
+    if not isinstance(label, str) or not label:
+        raise ValueError("Invalid industry name")
+    return "`" + label.replace("`", "``") + "`"
+
+# Format labels as ":`A`:`B`" in canonical order, or "" for an empty list
+def format_labels(labels):
+    return _format_canonical_labels(canonical_labels(labels))
+
+@lru_cache(maxsize=1024)
+def _format_canonical_labels(labels):
+    return "".join(f":{escape_label(label)}" for label in labels)
+
+# WHERE clause keeping nodes that carry every label in $industry_list. The labels travel as a
+# parameter, so every industry combination shares the same query text
+def industry_filter(variable):
+    return f"WHERE all(industry IN $industry_list WHERE industry IN labels({variable})) "
+
+# Remove and add labels on one node (uid) or many nodes (uids) in a single statement.
+# Empty lists leave the labels untouched instead of producing a malformed clause.
+def label_diff_query(variable, label, uid=None, labels_to_remove=None, labels_to_add=None, uids=None):
+    many = uids is not None
+    query = _label_diff_template(
+        variable, label, many,
+        canonical_labels(labels_to_remove),
+        canonical_labels(labels_to_add)
+    )
+    parameters = {"uids": list(uids)} if many else {"uid": uid}
+    return query, parameters
+
+@lru_cache(maxsize=1024)
+def _label_diff_template(variable, label, many, labels_to_remove, labels_to_add):
+    if many:
+        query = f"MATCH ({variable}:{label}) WHERE {variable}.uid IN $uids "
+    else:
+        query = f"MATCH ({variable}:{label}) WHERE {variable}.uid = $uid "
+
+    if labels_to_remove:
+        query += f"REMOVE {variable}{_format_canonical_labels(labels_to_remove)} "
+    if labels_to_add:
+        query += f"SET {variable}{_format_canonical_labels(labels_to_add)} "
+
+    query += f"RETURN {variable}"
+    return query
+
+# Number of memoised query strings, to watch the bound on distinct query texts
+def template_cache_info():
+    return {
+        "labels": _format_canonical_labels.cache_info()._asdict(),
+        "label_diff": _label_diff_template.cache_info()._asdict()
+    }
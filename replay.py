@@ -0,0 +1,248 @@
+# Replay a JSONL log of recorded requests against the entity classes as a load test.
+#
+#   python -m media.replay <log.jsonl> <uri> <username> <password> [--mode thread|asyncio]
+#       [--concurrency N] [--timing original|qps|none] [--qps Q] [--speed S]
+#
+# Each line is {"method": ..., "json_request": {...}} where method is "Class.method" (e.g.
+# "Journalist.find_journalists") or a method name defined by only one entity class. Methods
+# taking positional arguments can be logged with "args": [...] instead of "json_request".
+# An optional "timestamp" in seconds is used to replay the original inter-arrival times.
+#
+# With --timing original or qps requests are released on a schedule regardless of how many
+# are still running (open loop), and latency is measured from the scheduled time so queueing
+# behind slow requests is counted. With --timing none each worker sends its next request as
+# soon as the previous one finished (closed loop).
+#
+# A request fails when it raises or returns None, the value run_query returns for a query it
+# could not run. Methods that turn a failed query into a regular answer, like node_has_label
+# returning False, are counted as successes.
+from media.bulk import read_records
+from media.company import AsyncCompany, Company
+from media.journalist import AsyncJournalist, Journalist
+from media.media import AsyncMedia, Media
+from media.medialist import AsyncMedialist, Medialist
+from media.search import AsyncSearch, Search
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+
+# Entity classes by name, as (sync class, async class)
+ENTITY_CLASSES = {
+    "Journalist": (Journalist, AsyncJournalist),
+    "Company": (Company, AsyncCompany),
+    "Medialist": (Medialist, AsyncMedialist),
+    "Media": (Media, AsyncMedia),
+    "Search": (Search, AsyncSearch),
+}
+
+TIMINGS = ("original", "qps", "none")
+
+# Entity class a replay mode calls: the sync class in "thread" mode, the async one in "asyncio"
+def entity_class(entity, mode="thread"):
+    return ENTITY_CLASSES[entity][1 if mode == "asyncio" else 0]
+
+# Resolve a logged method to (class name, method name), checked against the classes the mode calls
+def resolve_method(method, mode="thread"):
+    if "." in method:
+        entity, name = method.split(".", 1)
+        if entity not in ENTITY_CLASSES or not hasattr(entity_class(entity, mode), name) or name.startswith("_"):
+            raise ValueError(f"Unknown method: {method}")
+        return entity, name
+
+    owners = [entity for entity in ENTITY_CLASSES if hasattr(entity_class(entity, mode), method) and not method.startswith("_")]
+    if len(owners) != 1:
+        raise ValueError(f"Unknown method: {method}" if not owners else f"Ambiguous method: {method}, prefix it with one of {owners}")
+    return owners[0], method
+
+# Parse log entries into (entity, method, args, timestamp)
+def load_log(source, mode="thread"):
+    entries = []
+    for entry in read_records(source, "jsonl"):
+        entity, method = resolve_method(entry["method"], mode)
+        args = entry["args"] if "args" in entry else [entry.get("json_request", {})]
+        entries.append((entity, method, args, entry.get("timestamp")))
+    return entries
+
+# Offsets in seconds from the start of the run at which each entry is released, or None
+def schedule(entries, timing, qps=None, speed=1.0):
+    if timing == "none":
+        return None
+    if timing == "qps":
+        if not qps:
+            raise ValueError("A target QPS is required for --timing qps")
+        return [index / qps for index in range(len(entries))]
+
+    timestamps = [timestamp for _, _, _, timestamp in entries]
+    if any(timestamp is None for timestamp in timestamps):
+        raise ValueError("Every entry needs a timestamp to replay the original timing")
+    first = timestamps[0]
+    return [(timestamp - first) / speed for timestamp in timestamps]
+
+# Error recorded for a call that returned None, which is how run_query reports a query that
+# failed, including connection, pool and retry failures that never reach the server
+QUERY_FAILED = "QueryFailed"
+
+# Per-method latencies and errors collected while replaying. Each request counts once: it
+# failed when it raised or returned None
+class ReplayStats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, latency, error=None):
+        with self._lock:
+            self.latencies.setdefault(method, []).append(latency)
+            if error is not None:
+                errors = self.errors.setdefault(method, {})
+                errors[error] = errors.get(error, 0) + 1
+
+    def report(self, elapsed):
+        methods = {}
+        total = 0
+        for method, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            errors = sum(self.errors.get(method, {}).values())
+            total += len(latencies)
+            methods[method] = {
+                "requests": len(latencies),
+                "errors": dict(self.errors.get(method, {})),
+                "error_rate": errors / len(latencies),
+                "p50_ms": _percentile(latencies, 0.50) * 1000,
+                "p95_ms": _percentile(latencies, 0.95) * 1000,
+                "p99_ms": _percentile(latencies, 0.99) * 1000,
+                "max_ms": latencies[-1] * 1000
+            }
+        return {
+            "requests": total,
+            "elapsed_seconds": elapsed,
+            "throughput": total / elapsed if elapsed else None,
+            "methods": methods
+        }
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def _drain(result):
+    if hasattr(result, "__next__"):
+        for _ in result:
+            pass
+
+async def _drain_async(result):
+    if hasattr(result, "__aiter__"):
+        async for _ in result:
+            pass
+    else:
+        _drain(result)
+
+# Replay with a thread pool over the sync entity classes
+def replay_threads(entries, uri, username, password, concurrency=8, offsets=None, stats=None):
+    stats = stats or ReplayStats()
+    instances = {entity: entity_class(entity)(uri, username, password) for entity in {entry[0] for entry in entries}}
+
+    def call(entity, method, args, released=None):
+        released = released or time.perf_counter()
+        error = None
+        try:
+            result = getattr(instances[entity], method)(*args)
+            if result is None:
+                error = QUERY_FAILED
+            _drain(result)
+        except Exception as e:
+            error = type(e).__name__
+        stats.record(f"{entity}.{method}", time.perf_counter() - released, error)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if offsets is None:
+            # Closed loop: each worker picks up the next entry as soon as it is free
+            for entity, method, args, _ in entries:
+                executor.submit(call, entity, method, args)
+        else:
+            for (entity, method, args, _), offset in zip(entries, offsets):
+                released = start + offset
+                delay = released - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(call, entity, method, args, released)
+    return stats.report(time.perf_counter() - start)
+
+# Replay on an event loop over the async entity classes
+async def replay_asyncio(entries, uri, username, password, concurrency=8, offsets=None, stats=None):
+    stats = stats or ReplayStats()
+    instances = {entity: entity_class(entity, "asyncio")(uri, username, password) for entity in {entry[0] for entry in entries}}
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def call(entity, method, args, offset):
+        if offset is not None:
+            await asyncio.sleep(max(0.0, start + offset - loop.time()))
+        released = time.perf_counter()
+        async with semaphore:
+            if offset is None:
+                released = time.perf_counter()
+            error = None
+            try:
+                result = await getattr(instances[entity], method)(*args)
+                if result is None:
+                    error = QUERY_FAILED
+                await _drain_async(result)
+            except Exception as e:
+                error = type(e).__name__
+            stats.record(f"{entity}.{method}", time.perf_counter() - released, error)
+
+    start = loop.time()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        call(entity, method, args, offsets[index] if offsets is not None else None)
+        for index, (entity, method, args, _) in enumerate(entries)
+    ))
+    return stats.report(time.perf_counter() - started)
+
+def replay(source, uri, username, password, mode="thread", concurrency=8, timing="none", qps=None, speed=1.0):
+    entries = load_log(source, mode)
+    offsets = schedule(entries, timing, qps, speed)
+
+    if mode == "asyncio":
+        return asyncio.run(replay_asyncio(entries, uri, username, password, concurrency, offsets))
+    return replay_threads(entries, uri, username, password, concurrency, offsets)
+
+def format_report(report):
+    lines = [
+        f"{report['requests']} requests in {report['elapsed_seconds']:.2f}s ({report['throughput']:.1f}/s)",
+        f"{'method':<45} {'requests':>8} {'error %':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    ]
+    for method, result in report["methods"].items():
+        lines.append(
+            f"{method:<45} {result['requests']:>8} {result['error_rate'] * 100:>8.2f} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m media.replay")
+    parser.add_argument("log")
+    parser.add_argument("uri")
+    parser.add_argument("username")
+    parser.add_argument("password")
+    parser.add_argument("--mode", choices=("thread", "asyncio"), default="thread")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timing", choices=TIMINGS, default="none")
+    parser.add_argument("--qps", type=float, help="target requests per second for --timing qps")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed-up factor for --timing original")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = replay(
+        args.log, args.uri, args.username, args.password,
+        args.mode, args.concurrency, args.timing, args.qps, args.speed
+    )
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
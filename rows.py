@@ -0,0 +1,182 @@
+# Compact typed results for the list endpoints.
+#
+# Set "rows" in a JSON request to have the list methods project only the requested "fields"
+# in Cypher (map projections instead of whole nodes) and return __slots__ dataclasses instead
+# of neo4j Records. In relationship listings the node shared by every row, such as the
+# medialist of each membership, is projected with "parent_fields" (uid only by default), and
+# every node is materialised once per result so repeated parents are the same object.
+from dataclasses import dataclass, fields as dataclass_fields
+from functools import lru_cache
+
+@dataclass(slots=True)
+class JournalistRow:
+    uid: str
+    first_name: str = None
+    last_name: str = None
+    birthdate: object = None
+    description: str = None
+    email: str = None
+    mobile_num: str = None
+    industries: tuple = ()
+
+@dataclass(slots=True)
+class CompanyRow:
+    uid: str
+    company_name: str = None
+    description: str = None
+    website_url: str = None
+    company_size_lower_bound: int = None
+    company_size_upper_bound: int = None
+    headquarters: str = None
+    email: str = None
+    founded_date: object = None
+    industries: tuple = ()
+
+@dataclass(slots=True)
+class MedialistRow:
+    uid: str
+    medialist_name: str = None
+    creation_datetime: object = None
+    description: str = None
+    member_count: int = None
+    industries: tuple = ()
+
+@dataclass(slots=True)
+class EmploymentRow:
+    journalist: JournalistRow
+    company: CompanyRow
+    role: str = None
+    start_date: object = None
+    end_date: object = None
+    element_id: str = None
+
+@dataclass(slots=True)
+class MembershipRow:
+    medialist: MedialistRow
+    person: JournalistRow
+    creation_datetime: object = None
+    element_id: str = None
+
+ROW_CLASSES = {
+    "Journalist": JournalistRow,
+    "Company": CompanyRow,
+    "Medialist": MedialistRow,
+}
+
+# Relationship properties projected for each relationship row
+RELATIONSHIP_FIELDS = {
+    EmploymentRow: ("role", "start_date", "end_date"),
+    MembershipRow: ("creation_datetime",),
+}
+
+# Validate requested fields against a row class, always keeping uid first
+def node_fields(row_class, fields=None):
+    names = [field.name for field in dataclass_fields(row_class)]
+    if fields is None:
+        return tuple(names)
+    for field in fields:
+        if field not in names:
+            raise ValueError("Invalid field name")
+    return ("uid",) + tuple(name for name in names if name in fields and name != "uid")
+
+# Map projection of a node, e.g. "journalist {.uid, .first_name}". extra holds further
+# "key: expression" items to append
+def node_projection(variable, label, fields=None, extra=()):
+    return _node_projection(variable, label, node_fields(ROW_CLASSES[label], fields), tuple(extra))
+
+@lru_cache(maxsize=1024)
+def _node_projection(variable, label, fields, extra):
+    items = []
+    for field in fields:
+        if field == "industries":
+            # Industries are the labels besides the entity label
+            items.append(f"industries: [industry IN labels({variable}) WHERE industry <> '{label}']")
+        else:
+            items.append(f".{field}")
+    items.extend(extra)
+    return f"{variable} {{{', '.join(items)}}}"
+
+# Item to RETURN for a node list: the whole node, or its projection when rows are requested
+def return_item(variable, label, json_request):
+    if not json_request.get("rows"):
+        return variable
+    return f"{node_projection(variable, label, json_request.get('fields'))} AS {variable}"
+
+# RETURN clause of a relationship listing. nodes is a list of (variable, label); parent names
+# the node shared by every row, which is projected with "parent_fields" instead of "fields".
+# The element id of the relationship is returned as "<relationship>_id" for keyset cursors
+def relationship_return(json_request, relationship, row_class, nodes, parent):
+    relationship_id = f"elementId({relationship}) AS {relationship}_id"
+    if not json_request.get("rows"):
+        return "RETURN " + ", ".join([relationship] + [variable for variable, _ in nodes] + [relationship_id])
+
+    properties = ", ".join(f".{field}" for field in RELATIONSHIP_FIELDS[row_class])
+    items = [f"{relationship} {{{properties}}} AS {relationship}"]
+    for variable, label in nodes:
+        if variable == parent:
+            fields = json_request.get("parent_fields", ["uid"])
+        else:
+            fields = json_request.get("fields")
+        items.append(f"{node_projection(variable, label, fields)} AS {variable}")
+    items.append(relationship_id)
+    return "RETURN " + ", ".join(items)
+
+# Convert driver values to compact Python ones: neo4j temporals to datetime, lists to tuples
+def _native(value):
+    if isinstance(value, list):
+        return tuple(value)
+    if hasattr(value, "to_native"):
+        return value.to_native()
+    return value
+
+def _row(row_class, values):
+    return row_class(**{key: _native(value) for key, value in values.items()})
+
+# Materialise each node once per result, keyed by uid
+class SharedNodes:
+    def __init__(self):
+        self._nodes = {}
+
+    def get(self, row_class, values):
+        key = (row_class, values["uid"])
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = _row(row_class, values)
+        return node
+
+# Apply build to every record of a list or a stream
+def hydrate(records, build):
+    if records is None:
+        return None
+    if isinstance(records, list):
+        return [build(record) for record in records]
+    if hasattr(records, "__aiter__"):
+        return _hydrate_async(records, build)
+    return (build(record) for record in records)
+
+async def _hydrate_async(records, build):
+    async for record in records:
+        yield build(record)
+
+# Rows for find_* results whose RETURN item came from return_item
+def node_rows(records, variable, label):
+    row_class = ROW_CLASSES[label]
+    return hydrate(records, lambda record: _row(row_class, record[variable]))
+
+def employment_rows(records, journalist, company):
+    shared = SharedNodes()
+    return hydrate(records, lambda record: EmploymentRow(
+        shared.get(JournalistRow, record[journalist]),
+        shared.get(CompanyRow, record[company]),
+        element_id=record["employment_id"],
+        **{key: _native(value) for key, value in record["employment"].items()}
+    ))
+
+def membership_rows(records):
+    shared = SharedNodes()
+    return hydrate(records, lambda record: MembershipRow(
+        shared.get(MedialistRow, record["medialist"]),
+        shared.get(JournalistRow, record["person"]),
+        element_id=record["included_id"],
+        **{key: _native(value) for key, value in record["included"].items()}
+    ))
@@ -0,0 +1,109 @@
+from media.connection import Neo4jConnection
+import sys
+
+# Uniqueness constraints as (name, label, property)
+UNIQUE_CONSTRAINTS = [
+    ("journalist_uid_unique", "Journalist", "uid"),
+    ("company_uid_unique", "Company", "uid"),
+    ("medialist_uid_unique", "Medialist", "uid"),
+]
+
+# Range indexes on node properties as (name, label, property)
+NODE_INDEXES = [
+    ("journalist_first_name", "Journalist", "first_name"),
+    ("journalist_last_name", "Journalist", "last_name"),
+    ("company_company_name", "Company", "company_name"),
+    ("medialist_medialist_name", "Medialist", "medialist_name"),
+]
+
+# Range indexes on relationship properties as (name, type, property)
+RELATIONSHIP_INDEXES = [
+    ("employment_start_date", "EMPLOYMENT", "start_date"),
+    ("employment_end_date", "EMPLOYMENT", "end_date"),
+    ("included_creation_datetime", "INCLUDED", "creation_datetime"),
+    ("note_creation_date", "NOTE", "creation_date"),
+]
+
+# Full-text indexes used to shortlist fuzzy name searches as (name, label, properties)
+FULLTEXT_INDEXES = [
+    ("journalist_names", "Journalist", ["first_name", "last_name"]),
+    ("company_names", "Company", ["company_name"]),
+    ("medialist_names", "Medialist", ["medialist_name"]),
+    ("media_names", "media", ["first_name", "last_name"]),
+]
+
+# Build the idempotent statements that create every constraint and index
+def schema_statements():
+    statements = []
+    for name, label, prop in UNIQUE_CONSTRAINTS:
+        statements.append(
+            f"CREATE CONSTRAINT {name} IF NOT EXISTS "
+            f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+        )
+    for name, label, prop in NODE_INDEXES:
+        statements.append(
+            f"CREATE INDEX {name} IF NOT EXISTS "
+            f"FOR (n:{label}) ON (n.{prop})"
+        )
+    for name, rel_type, prop in RELATIONSHIP_INDEXES:
+        statements.append(
+            f"CREATE INDEX {name} IF NOT EXISTS "
+            f"FOR ()-[r:{rel_type}]-() ON (r.{prop})"
+        )
+    for name, label, props in FULLTEXT_INDEXES:
+        fields = ", ".join(f"n.{prop}" for prop in props)
+        statements.append(
+            f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS "
+            f"FOR (n:{label}) ON EACH [{fields}]"
+        )
+    return statements
+
+# Names of every index the application expects, including the ones backing constraints
+def expected_index_names():
+    indexes = UNIQUE_CONSTRAINTS + NODE_INDEXES + RELATIONSHIP_INDEXES + FULLTEXT_INDEXES
+    return [name for name, _, _ in indexes]
+
+# Create any missing constraints and indexes; safe to run repeatedly
+def ensure_schema(connection):
+    for statement in schema_statements():
+        connection.run_query(statement)
+
+# Report expected indexes that are missing or not yet online
+def verify_schema(connection):
+    records = connection.run_query(
+        "SHOW INDEXES YIELD name, state, populationPercent "
+        "RETURN name, state, populationPercent"
+    ) or []
+    existing = {record["name"]: record for record in records}
+
+    report = {"missing": [], "building": [], "failed": []}
+    for name in expected_index_names():
+        record = existing.get(name)
+        if record is None:
+            report["missing"].append(name)
+        elif record["state"] == "POPULATING":
+            report["building"].append((name, record["populationPercent"]))
+        elif record["state"] != "ONLINE":
+            report["failed"].append((name, record["state"]))
+    return report
+
+# Create and verify the schema, printing anything that is not ready. Intended to run at startup
+def bootstrap_schema(uri, username, password, **pool_config):
+    connection = Neo4jConnection(uri, username, password, **pool_config)
+    ensure_schema(connection)
+    report = verify_schema(connection)
+
+    for name in report["missing"]:
+        print("Missing index:", name)
+    for name, percent in report["building"]:
+        print(f"Index still building: {name} ({percent:.1f}%)")
+    for name, state in report["failed"]:
+        print(f"Index not online: {name} ({state})")
+    return report
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python -m media.schema <uri> <username> <password>")
+        sys.exit(2)
+    result = bootstrap_schema(*sys.argv[1:])
+    sys.exit(1 if result["missing"] or result["failed"] else 0)
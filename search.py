@@ -0,0 +1,156 @@
+# Name search and industry facet counts across every entity type in one round trip.
+#
+# Each type is searched like its own find_* name search (full-text shortlist, then the exact
+# apoc.text.distance on the shortlist) inside one UNION subquery, so the results share the
+# same distance and can be merged and ranked by the server.
+from media import company, journalist, media, medialist
+from media.cache import cache_facets, cached_facets
+from media.connection import AsyncNeo4jConnection, Neo4jConnection
+from media.fuzzy import fuzzy_candidates, fuzzy_parameters
+
+# Searchable types as (type, variable, label, full-text index, distances)
+SEARCH_TYPES = [
+    ("Journalist", "journalist", "Journalist", "journalist_names", journalist.NAME_DISTANCES),
+    ("Company", "company", "Company", "company_names", company.NAME_DISTANCES),
+    ("Medialist", "medialist", "Medialist", "medialist_names", medialist.NAME_DISTANCES),
+    ("Media", "media", "media", "media_names", media.NAME_DISTANCES),
+]
+
+# Nodes of one type within max_distance of the name, each with its closest distance
+def search_candidates(variable, label, index_name, distances, json_request, industry_list=None):
+    aliases = ", ".join(alias for alias, _, _ in distances)
+    return (
+        fuzzy_candidates(variable, label, index_name, distances, json_request, industry_list)
+        + f"WITH {variable}, apoc.coll.min([{aliases}]) AS distance "
+    )
+
+# One branch of the search: the candidates of one type, closest first
+def _search_branch(search_type, variable, label, index_name, distances, json_request):
+    query = search_candidates(variable, label, index_name, distances, json_request, json_request.get("industry_list"))
+    query += f"RETURN '{search_type}' AS type, {variable} AS node, distance ORDER BY distance"
+    if _type_limit(search_type, json_request) is not None:
+        query += f" LIMIT ${variable}_limit"
+    return query
+
+# Limit of one type: "limits" by type, else "per_type_limit"
+def _type_limit(search_type, json_request):
+    return (json_request.get("limits") or {}).get(search_type, json_request.get("per_type_limit"))
+
+# Rank matches of every requested type ("types", all by default) by their closest edit
+# distance and keep the "top_k" overall. Rows are (type, node, distance, score) where score is
+# 1 / (1 + distance), so 1.0 is an exact match. Takes the options of the find_* name searches
+def search_all_query(json_request):
+    name = json_request.get("name")
+    top_k = json_request.get("top_k")
+    types = json_request.get("types")
+
+    targets = [target for target in SEARCH_TYPES if types is None or target[0] in types]
+    if not name or not targets:
+        raise ValueError("A name and at least one known type are required")
+
+    query = (
+        "CALL { "
+        + " UNION ALL ".join(_search_branch(*target, json_request) for target in targets)
+        + " } "
+        "WITH type, node, distance "
+        "ORDER BY distance, type "
+        + ("LIMIT $top_k " if top_k is not None else "")
+        + "RETURN type, node, distance, 1.0 / (1 + distance) AS score"
+    )
+
+    parameters = fuzzy_parameters(json_request, json_request.get("industry_list"))
+    parameters["top_k"] = top_k
+    for search_type, variable, _, _, _ in targets:
+        parameters[f"{variable}_limit"] = _type_limit(search_type, json_request)
+    return query, parameters
+
+# Types counted by industry_facets unless "types" says otherwise
+FACET_TYPES = ("Journalist", "Company", "Medialist")
+
+# Count the nodes of each type ("types", FACET_TYPES by default) per industry label in one
+# aggregate query, over every node or, when "name" is given, over the nodes matching the name
+# like the find_* searches do. Rows are (type, industry, count)
+def industry_facets_query(json_request):
+    name = json_request.get("name")
+    types = json_request.get("types") or FACET_TYPES
+
+    branches = []
+    for search_type, variable, label, index_name, distances in SEARCH_TYPES:
+        if search_type not in types:
+            continue
+        if name:
+            query = search_candidates(variable, label, index_name, distances, json_request)
+        else:
+            query = f"MATCH ({variable}:{label}) "
+        query += (
+            f"UNWIND [industry IN labels({variable}) WHERE industry <> '{label}'] AS industry "
+            f"RETURN '{search_type}' AS type, industry, count(*) AS count"
+        )
+        branches.append(query)
+    if not branches:
+        raise ValueError("At least one known type is required")
+
+    query = (
+        "CALL { " + " UNION ALL ".join(branches) + " } "
+        "RETURN type, industry, count ORDER BY type, count DESC, industry"
+    )
+    return query, fuzzy_parameters(json_request) if name else {}
+
+# Cache key of a facet request: the counted types and the name filter
+def _facet_key(json_request):
+    types = tuple(sorted(json_request.get("types") or FACET_TYPES))
+    if not json_request.get("name"):
+        return (types,)
+    return (
+        types, json_request.get("name"), json_request.get("max_distance"),
+        bool(json_request.get("exhaustive")), json_request.get("candidate_limit")
+    )
+
+# {type: {industry: count}} from the facet rows, with every requested type present
+def _facets(records, json_request):
+    if records is None:
+        return None
+    facets = {search_type: {} for search_type in json_request.get("types") or FACET_TYPES}
+    for record in records:
+        facets.setdefault(record["type"], {})[record["industry"]] = record["count"]
+    return facets
+
+class Search(Neo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        Neo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/search GET Search journalists, companies, medialists and media by name at once
+    def search_all(self, json_request):
+        query, parameters = search_all_query(json_request)
+        return self.run_list_query(query, parameters, json_request)
+
+    # api/search/facets GET Count journalists, companies and medialists per industry, served
+    # from the facet cache when it is enabled
+    def industry_facets(self, json_request):
+        key = _facet_key(json_request)
+        hit, facets, version = cached_facets(key)
+        if hit:
+            return facets
+        facets = _facets(self.run_read_query(*industry_facets_query(json_request)), json_request)
+        cache_facets(key, facets, version)
+        return facets
+
+class AsyncSearch(AsyncNeo4jConnection):
+    def __init__(self, uri, username, password, **pool_config):
+        AsyncNeo4jConnection.__init__(self, uri, username, password, **pool_config)
+
+    # api/search GET Search journalists, companies, medialists and media by name at once
+    async def search_all(self, json_request):
+        query, parameters = search_all_query(json_request)
+        return await self.run_list_query(query, parameters, json_request)
+
+    # api/search/facets GET Count journalists, companies and medialists per industry, served
+    # from the facet cache when it is enabled
+    async def industry_facets(self, json_request):
+        key = _facet_key(json_request)
+        hit, facets, version = cached_facets(key)
+        if hit:
+            return facets
+        facets = _facets(await self.run_read_query(*industry_facets_query(json_request)), json_request)
+        cache_facets(key, facets, version)
+        return facets